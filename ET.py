@@ -2,109 +2,174 @@ import os
 import time
 import json
 import openai
-import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
-from bs4 import BeautifulSoup
-import tiktoken
+from selenium.common.exceptions import (TimeoutException, WebDriverException, StaleElementReferenceException,
+                                        InvalidSessionIdException, NoSuchWindowException)
 import csv
+import math
+import hashlib
+import threading
+from html_extract import CONTAINER_CLASS, html_to_markdown, extract_text_from_page_source
+import page_cache
+import work_queue
+import retry_policy
+import browser_profile
+import embedding_backends
+import kb_crawler
 
 # Load environment variables
 load_dotenv()
 
-# Set OpenAI API key
+# Set OpenAI API key (checked when the script runs, not at import)
 openai.api_key = os.getenv('OPENAI_API_KEY')
-if not openai.api_key:
-    print("Error: OPENAI_API_KEY not found in environment variables")
-    exit(1)
 
 # Use the fixed CSV file name "KB.csv"
 csv_filename = "KB.csv"
 
+# "container" pulls only the article div's outer HTML and keeps headings/lists/tables
+# as markdown; "page" is the old full page_source + BeautifulSoup plain-text path
+EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'container')
+
+# "full" keeps sequential IDs and skips every leaf already in processing_log.csv;
+# "incremental" re-reads every leaf, uses deterministic IDs and re-embeds only changed chunks
+INDEX_MODE = os.getenv('INDEX_MODE', 'full')
+CHUNK_MANIFEST = 'chunk_manifest.json'
+STALE_IDS_FILE = 'stale_ids.json'
+log_filename = 'processing_log.csv'
+
+# "inline" repeats the full hierarchy in every record; "normalized" stores each hierarchy
+# node once in Chunks/hierarchy_nodes.json and records only carry its node_id
+METADATA_LAYOUT = os.getenv('METADATA_LAYOUT', 'inline')
+HIERARCHY_NODES_FILE = os.path.join("Chunks", "hierarchy_nodes.json")
+
+# With CRAWL_ROOT_LINK and a shared WORK_QUEUE_DB only the worker holding this role crawls
+CRAWL_ROLE = 'crawler'
+
+# Embedding backend for this run (EMBEDDING_BACKEND=openai|local, see embedding_backends.py);
+# its model and dimensions are recorded in Chunks/embedding_info.json for LOAD.py
+embedder = embedding_backends.get_backend()
+EMBEDDING_INFO_FILE = os.path.join("Chunks", "embedding_info.json")
+
 # Read the CSV file
-try:
-    df = pd.read_csv(csv_filename)
-    # Convert DataFrame to list of dictionaries and ensure all required columns exist
-    required_columns = ['Root Node', 'Root Link', 'P1 Name', 'P1 Link', 
-                        'P2 Name', 'P2 Link', 'P3 Name', 'P3 Link',
-                        'P4 Name', 'P4 Link', 'Leaf name', 'Leaf Link']
-    
-    print("Available columns in CSV:", df.columns.tolist())
-    
-    if not all(col in df.columns for col in required_columns):
-        print("Error: CSV file is missing required columns. Please ensure all required columns exist:")
-        print(required_columns)
-        exit(1)
+def load_leaf_data(csv_filename):
+    import pandas as pd
+    try:
+        df = pd.read_csv(csv_filename)
+        # Convert DataFrame to list of dictionaries and ensure all required columns exist
+        required_columns = ['Root Node', 'Root Link', 'P1 Name', 'P1 Link', 
+                            'P2 Name', 'P2 Link', 'P3 Name', 'P3 Link',
+                            'P4 Name', 'P4 Link', 'Leaf name', 'Leaf Link']
+        
+        print("Available columns in CSV:", df.columns.tolist())
         
-    leaf_data = df[required_columns].to_dict('records')
-except FileNotFoundError:
-    print(f"Error: File '{csv_filename}' not found in the current directory.")
-    exit(1)
-except Exception as e:
-    print(f"Error reading CSV file: {e}")
-    exit(1)
-
-# Set up headless browser options
-chrome_options = Options()
-chrome_options.add_argument('--headless=new')
-chrome_options.add_argument('--no-sandbox')
-chrome_options.add_argument('--disable-dev-shm-usage')
-chrome_options.add_argument('--disable-gpu')
-chrome_options.add_argument('--window-size=1920,1080')
-chrome_options.add_argument('--remote-debugging-port=9222')
-
-# Initialize the browser with service
-service = Service()
-driver = webdriver.Chrome(options=chrome_options)
+        if not all(col in df.columns for col in required_columns):
+            print("Error: CSV file is missing required columns. Please ensure all required columns exist:")
+            print(required_columns)
+            exit(1)
+            
+        return df[required_columns].to_dict('records')
+    except FileNotFoundError:
+        print(f"Error: File '{csv_filename}' not found in the current directory.")
+        exit(1)
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        exit(1)
+
+# Per-host wait timeouts learned from observed load times
+host_timeouts = retry_policy.HostTimeouts(initial=30, minimum=5, maximum=60)
+
+# Headless Chrome, started on first use so cache-only runs never launch it.
+# BROWSER_PROFILE=lean (default) blocks images/fonts/CSS/media/trackers and reuses a
+# persistent profile; "default" keeps the old plain options. driver.get() returns at
+# DOMContentLoaded ('eager'); readiness is decided by the container below.
+browser = browser_profile.BrowserSession(page_load_strategy='eager', page_load_timeout=host_timeouts.maximum)
+
+# Wait condition: the article container exists and has rendered some text
+def container_ready(driver):
+    elements = driver.find_elements(By.CLASS_NAME, CONTAINER_CLASS)
+    if elements and elements[0].text.strip():
+        return elements[0]
+    return False
+
+# WebDriver errors that mean the browser session itself is gone, as opposed to a page-level failure
+SESSION_ERROR_MARKERS = ('chrome not reachable', 'disconnected', 'session deleted', 'no such session',
+                         'target window already closed', 'failed to establish a new connection')
+
+def is_session_error(e):
+    if isinstance(e, (InvalidSessionIdException, NoSuchWindowException, ConnectionError)):
+        return True
+    return any(marker in str(e).lower() for marker in SESSION_ERROR_MARKERS)
 
 # Function to scrape text from a given URL
 def scrape_text(url):
-    max_retries = 3
-    for attempt in range(max_retries):
+    def attempt():
+        start = time.monotonic()
         try:
+            driver = browser.driver
             driver.get(url)
-            time.sleep(10)  # Allow time for the page to load
-            
-            try:
-                WebDriverWait(driver, 30).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, 'ArticleDetailLeftContainer__box'))
-                )
-            except TimeoutException:
-                print(f"Warning: Timeout waiting for content on {url}, retrying...")
-                driver.refresh()
-                time.sleep(5)
-                continue
-            except WebDriverException as e:
-                print(f"WebDriver error: {e}")
-                time.sleep(10)
-                continue
-            
-            html = driver.page_source
-            soup = BeautifulSoup(html, 'html.parser')
-            main_content = soup.find('div', {'class': 'ArticleDetailLeftContainer__box'})
-            if main_content:
-                text = main_content.get_text(separator='\n', strip=True)
-                if text.strip():
-                    return text
-            print(f"Warning: No content found for {url}, retrying...")
+            # The container can be re-rendered between find and read; keep polling rather than failing
+            container = WebDriverWait(driver, host_timeouts.timeout(url), poll_frequency=0.25,
+                                      ignored_exceptions=(StaleElementReferenceException,)).until(container_ready)
+            host_timeouts.observe(url, time.monotonic() - start)
+
+            if EXTRACTION_MODE == 'page':
+                text = extract_text_from_page_source(driver.page_source)
+            else:
+                text = html_to_markdown(container.get_attribute('outerHTML'))
+            if text and text.strip():
+                return text
+            print(f"Warning: No content found for {url}")
+        except TimeoutException:
+            print(f"Warning: Timeout after {host_timeouts.timeout(url):.0f}s waiting for content on {url}")
+            host_timeouts.observe_timeout(url)
         except Exception as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            time.sleep(10)
-    return None  # If all attempts fail, return None
+            if is_session_error(e):
+                print(f"WebDriver session lost: {e}")
+                browser.quit()  # next attempt starts a fresh browser
+            elif isinstance(e, WebDriverException):
+                print(f"WebDriver error on {url}: {e}")
+            else:
+                print(f"Scrape attempt failed for {url}: {e}")
+        return None
+
+    # None if all attempts fail
+    text = retry_policy.retry(attempt, description=f"scrape of {url}")
+    browser.page_done()
+    return text
+
+# Serve article text from the page cache when allowed, otherwise scrape and cache it
+def get_article_text(url):
+    cached = page_cache.get_cached_text(url, EXTRACTION_MODE)
+    if cached is not None:
+        print(f"Using cached page for: {url}")
+        return cached
+    if page_cache.CACHE_MODE == 'cache-only':
+        return None
+    print(f"Scraping data from: {url}")
+    text = scrape_text(url)
+    if text:
+        page_cache.store_text(url, text, EXTRACTION_MODE)
+    return text
+
+_tokenizer = None
+
+def get_tokenizer():
+    # tiktoken is imported and its encoding loaded once, on the first chunking call
+    global _tokenizer
+    if _tokenizer is None:
+        import tiktoken
+        _tokenizer = tiktoken.get_encoding("cl100k_base")
+    return _tokenizer
 
 def chunk_text_by_tokens(text, max_tokens=7000):
     if not text or not isinstance(text, str):
         print("Warning: Invalid text input for chunking")
         return []
     
-    tokenizer = tiktoken.get_encoding("cl100k_base")
+    tokenizer = get_tokenizer()
     tokens = tokenizer.encode(text)
     chunks = []
 
@@ -119,26 +184,7 @@ def chunk_text_by_tokens(text, max_tokens=7000):
 
     return chunks
 
-def embed_text_openai(text):
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = openai.Embedding.create(
-                input=text,
-                model="text-embedding-ada-002"
-            )
-            return response["data"][0]["embedding"]
-        except openai.error.RateLimitError:
-            if attempt == max_retries - 1:
-                print("Rate limit reached, failing after max retries")
-                return None
-            print("Rate limit reached, waiting 60 seconds...")
-            time.sleep(60)
-        except Exception as e:
-            print(f"Error generating embedding: {e}")
-            return None
-
-def save_embeddings_to_json(embeddings, file_count):
+def save_embeddings_to_json(embeddings, file_count, compact=False):
     folder_path = "Chunks"
     os.makedirs(folder_path, exist_ok=True)
     file_name = f"embeddings_batch_{file_count}.json"
@@ -146,10 +192,15 @@ def save_embeddings_to_json(embeddings, file_count):
     
     try:
         with open(file_path, 'w', encoding='utf-8') as json_file:
-            json.dump(embeddings, json_file, ensure_ascii=False, indent=4)
+            if compact:
+                json.dump(embeddings, json_file, ensure_ascii=False, separators=(',', ':'))
+            else:
+                json.dump(embeddings, json_file, ensure_ascii=False, indent=4)
         print(f"Saved {len(embeddings)} embeddings to {file_path}")
+        return True
     except Exception as e:
         print(f"Error saving embeddings to JSON: {e}")
+        return False
 
 # Create CSV file to log errors with leaf details
 def create_error_log_file():
@@ -171,10 +222,21 @@ def log_error_to_csv(error_log_filename, leaf_data, error_message):
         print(f"Logged error for {leaf_data['Leaf name']} to {error_log_filename}")
     except Exception as e:
         print(f"Error writing to error log file: {e}")
+def log_to_csv(log_filename, leaf_name, leaf_link, chunk_status, embedding_status, num_chunks, timestamp):
+    try:
+        write_header = not os.path.exists(log_filename)
+        with open(log_filename, 'a', newline='') as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(['Leaf name', 'Leaf Link', 'Chunk Status', 'Embedding Status', 'Num Chunks', 'Timestamp'])
+            writer.writerow([leaf_name, leaf_link, chunk_status, embedding_status, num_chunks, timestamp])
+    except Exception as e:
+        print(f"Error writing to log file: {e}")
+
 def get_processed_leaves():
     processed_leaves = set()
-    log_filename = 'processing_log.csv'
     if os.path.exists(log_filename):
+        import pandas as pd
         try:
             log_df = pd.read_csv(log_filename)
             successful_leaves = log_df[
@@ -186,38 +248,250 @@ def get_processed_leaves():
             print(f"Error reading log file: {e}")
     return processed_leaves
 
-def scrape_chunk_and_embed(leaf_data):
-    total_leaves = len(leaf_data)
-    print(f"Starting processing of {total_leaves} leaves...")
+# Deterministic vector ID: same leaf link and chunk position always map to the same ID
+def make_vector_id(leaf_link, chunk_index):
+    link_hash = hashlib.sha1(leaf_link.encode('utf-8')).hexdigest()[:16]
+    return f"{link_hash}-{chunk_index}"
+
+def hash_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# Manifest of what is currently embedded: {leaf_link: {vector_id: chunk_hash}}
+def load_chunk_manifest():
+    if os.path.exists(CHUNK_MANIFEST):
+        try:
+            with open(CHUNK_MANIFEST, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading chunk manifest: {e}")
+    return {}
+
+def save_chunk_manifest(manifest):
+    with open(CHUNK_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4)
+
+# IDs that LOAD.py should delete from the vector store on its next run. IDs that are
+# live in the manifest again (a chunk re-created, a leaf listed again) are taken off
+# the list, otherwise LOAD.py would delete the vector it just upserted
+def append_stale_ids(stale_ids, live_ids=()):
+    existing = []
+    if os.path.exists(STALE_IDS_FILE):
+        with open(STALE_IDS_FILE, 'r', encoding='utf-8') as f:
+            existing = json.load(f)
+    updated = (set(existing) | set(stale_ids)) - set(live_ids)
+    if updated == set(existing):
+        return
+    with open(STALE_IDS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(sorted(updated), f, indent=4)
+    print(f"Marked {len(updated - set(existing))} stale vector IDs for deletion, "
+          f"{len(set(existing) - updated)} re-created IDs kept")
+
+# Sequential IDs that full-mode runs wrote for each leaf, read once from the Chunks batch
+# files. A leaf entering the manifest for the first time gets new deterministic IDs, so
+# these old vectors have to be deleted or switching a full index to incremental duplicates it
+_legacy_ids = None
+
+def legacy_vector_ids(leaf_link):
+    global _legacy_ids
+    if _legacy_ids is None:
+        _legacy_ids = {}
+        folder_path = "Chunks"
+        nodes = load_hierarchy_nodes()
+        if os.path.exists(folder_path):
+            for filename in os.listdir(folder_path):
+                if not (filename.startswith("embeddings_batch_") and filename.endswith(".json")):
+                    continue
+                try:
+                    with open(os.path.join(folder_path, filename), 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except Exception as e:
+                    print(f"Error reading {filename}: {e}")
+                    continue
+                for item in data:
+                    if not isinstance(item.get("id"), int):
+                        continue
+                    metadata = item.get("metadata") or nodes.get(item.get("node_id"), {})
+                    _legacy_ids.setdefault(metadata.get("leaf_link"), []).append(str(item["id"]))
+    return _legacy_ids.get(leaf_link, [])
+
+# Incremental queue pass: once every listed leaf has been enqueued, leaves that were not
+# listed again lose their vectors (the queue counterpart of the removal step at the end of
+# scrape_chunk_and_embed); idempotent, so every worker that enqueued the full list may run it
+def remove_unlisted_leaves(conn, pass_number):
+    with work_queue.exclusive(conn):
+        listed = work_queue.listed_leaves(conn, pass_number)
+        manifest = load_chunk_manifest()
+        stale = []
+        for removed_link in [link for link in manifest if link not in listed and manifest[link]]:
+            print(f"Leaf no longer listed, removing its vectors: {removed_link}")
+            stale.extend(manifest[removed_link])
+            # Keep an empty entry so LOAD.py also drops the leaf's old records from batch files
+            manifest[removed_link] = {}
+        if stale:
+            save_chunk_manifest(manifest)
+            append_stale_ids(stale, {vid for chunks in manifest.values() for vid in chunks})
+        forgotten = work_queue.forget_unlisted(conn, pass_number)
+    if forgotten:
+        print(f"Removed {forgotten} leaves that are no longer listed from the queue")
+
+# Node ID derived from the whole Root -> Leaf path, so every worker computes the same one
+def make_node_id(metadata):
+    path = json.dumps([metadata[key] for key in sorted(metadata)], default=str)
+    return hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+
+def load_hierarchy_nodes():
+    if os.path.exists(HIERARCHY_NODES_FILE):
+        try:
+            with open(HIERARCHY_NODES_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading hierarchy nodes: {e}")
+    return {}
+
+def save_hierarchy_nodes(nodes):
+    os.makedirs(os.path.dirname(HIERARCHY_NODES_FILE), exist_ok=True)
+    tmp_path = HIERARCHY_NODES_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(nodes, f, ensure_ascii=False, indent=4, default=str)
+    os.replace(tmp_path, HIERARCHY_NODES_FILE)
+
+# Record the backend's model/dimensions, refusing to mix models in one Chunks folder
+def check_embedding_info():
+    info = embedder.info()
+    if os.path.exists(EMBEDDING_INFO_FILE):
+        with open(EMBEDDING_INFO_FILE, 'r', encoding='utf-8') as f:
+            existing = json.load(f)
+        if existing != info:
+            print(f"Error: Chunks were embedded with {existing}, this run uses {info}. "
+                  f"Use a fresh Chunks folder when switching embedding backends.")
+            exit(1)
+        return
+    os.makedirs(os.path.dirname(EMBEDDING_INFO_FILE), exist_ok=True)
+    with open(EMBEDDING_INFO_FILE, 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=4)
+
+def scrape_chunk_and_embed(leaf_data, queue_conn=None, worker_id=None):
+    # In queue mode leaf_data is None for a worker that only leases what another worker lists
+    lease_only = leaf_data is None
+    leaf_data = [] if lease_only else leaf_data
+    # A kb_crawler.LeafStream has no length: leaves arrive while the crawl is still running
+    total_leaves = len(leaf_data) if hasattr(leaf_data, '__len__') else None
+    print(f"Starting processing of {total_leaves if total_leaves is not None else 'streamed'} leaves...")
     
     embeddings_batch = []
     batch_size = 50
     file_count = 1
     id_counter = 1
     error_log_filename = create_error_log_file()
+    incremental = INDEX_MODE == 'incremental'
+    normalized = METADATA_LAYOUT == 'normalized'
+    # Sequential IDs cannot be shared between workers, so queue workers always use deterministic ones
+    deterministic_ids = incremental or queue_conn is not None
 
     # Get the last successful ID from existing JSON files
     last_id = get_last_processed_id()
     if last_id:
         id_counter = last_id + 1
-        file_count = (last_id // batch_size) + 1
+    file_count = get_next_batch_number()
 
-    # Get already processed leaves
-    processed_leaves = get_processed_leaves()
-    print(f"Found {len(processed_leaves)} already processed leaves")
+    page_cache.migrate_legacy_index()
+    check_embedding_info()
 
-    idx = 0
-    while idx < len(leaf_data):
-        leaf = leaf_data[idx]
-        leaf_link = leaf.get('Leaf Link')
-        
-        # Skip already processed leaves
-        if leaf_link in processed_leaves:
-            print(f"Skipping already processed leaf: {leaf.get('Leaf name')}")
-            idx += 1
-            continue
+    # Manifest changes, stale IDs and processing_log rows are only committed once the
+    # batch holding the new embeddings is on disk, so an interrupted run never loses chunks
+    manifest = load_chunk_manifest() if incremental else {}
+    pending_manifest = {}
+    pending_stale = []
+    pending_logs = []
+    batch_leaves = []  # (leaf, its records) whose results are waiting in embeddings_batch
+    leases = None  # queue mode: the worker's LeaseHeartbeat, leaves are acknowledged per batch
+    hierarchy_nodes = load_hierarchy_nodes() if normalized else {}
+    pending_nodes = {}
 
-        print(f"Processing leaf {idx + 1} of {total_leaves} ({((idx+1)/total_leaves)*100:.1f}%)")
+    # A worker whose lease expired (e.g. stalled past WORK_QUEUE_LEASE) no longer owns the
+    # leaf; its records are dropped so only the new owner writes and merges them
+    def drop_lost_leaves():
+        nonlocal embeddings_batch, pending_manifest, pending_logs, batch_leaves
+        kept = []
+        for leaf, records in batch_leaves:
+            leaf_link = leaf.get('Leaf Link')
+            if leaf_link not in leases.lost:
+                kept.append((leaf, records))
+                continue
+            print(f"Lease lost for {leaf_link}, dropping its {len(records)} records")
+            dropped = {id(record) for record in records}
+            embeddings_batch = [record for record in embeddings_batch if id(record) not in dropped]
+            pending_manifest.pop(leaf_link, None)
+            pending_logs = [log_row for log_row in pending_logs if log_row[1] != leaf_link]
+        batch_leaves = kept
+
+    # Returns False if the batch could not be written; its leaves are then reported as
+    # failed and nothing about them is committed, so they are embedded again next time
+    def flush_batch():
+        nonlocal embeddings_batch, file_count, manifest, pending_manifest, pending_stale, pending_logs, \
+            batch_leaves, hierarchy_nodes, pending_nodes
+        # Nodes go to disk before any batch that references them
+        if pending_nodes:
+            if queue_conn is not None:
+                with work_queue.exclusive(queue_conn):
+                    hierarchy_nodes = load_hierarchy_nodes()
+                    hierarchy_nodes.update(pending_nodes)
+                    save_hierarchy_nodes(hierarchy_nodes)
+            else:
+                hierarchy_nodes.update(pending_nodes)
+                save_hierarchy_nodes(hierarchy_nodes)
+            pending_nodes = {}
+        if leases is not None and leases.lost:
+            drop_lost_leaves()
+        if embeddings_batch:
+            if queue_conn is not None:
+                file_count = work_queue.next_counter(queue_conn, 'embeddings_batch', get_next_batch_number() - 1)
+            if not save_embeddings_to_json(embeddings_batch, file_count, compact=normalized):
+                for leaf, _ in batch_leaves:
+                    if queue_conn is not None:
+                        work_queue.fail(queue_conn, leaf.get('Leaf Link'), worker_id, "Could not write embeddings batch")
+                        leases.release(leaf.get('Leaf Link'))
+                    else:
+                        log_error_to_csv(error_log_filename, leaf, "Could not write embeddings batch")
+                embeddings_batch, pending_manifest, pending_stale, pending_logs, batch_leaves = [], {}, [], [], []
+                return False
+            file_count += 1
+            embeddings_batch = []
+        if incremental and (pending_manifest or pending_stale):
+            def merge_manifest():
+                nonlocal manifest
+                if queue_conn is not None:
+                    manifest = load_chunk_manifest()  # other workers may have written since
+                for link, chunks in pending_manifest.items():
+                    if link not in manifest:
+                        pending_stale.extend(legacy_vector_ids(link))
+                    pending_stale.extend(vid for vid in manifest.get(link, {}) if vid not in chunks)
+                manifest.update(pending_manifest)
+                save_chunk_manifest(manifest)
+                append_stale_ids(pending_stale, {vid for chunks in manifest.values() for vid in chunks})
+            if queue_conn is not None:
+                with work_queue.exclusive(queue_conn):
+                    merge_manifest()
+            else:
+                merge_manifest()
+            pending_manifest = {}
+            pending_stale = []
+        for log_row in pending_logs:
+            log_to_csv(log_filename, *log_row)
+        pending_logs = []
+        if queue_conn is not None and batch_leaves:
+            # Acknowledged only now that their embeddings and manifest entries are on disk
+            acked = [leaf.get('Leaf Link') for leaf, _ in batch_leaves]
+            work_queue.complete_many(queue_conn, acked, worker_id)
+            for leaf_link in acked:
+                leases.release(leaf_link)
+        batch_leaves = []
+        return True
+
+    # Scrape, chunk and embed one leaf; returns None on success or an error message
+    def process_leaf(leaf):
+        nonlocal id_counter
+        leaf_link = leaf.get('Leaf Link')
         
         # Get all metadata from the current leaf record
         leaf_name = leaf.get('Leaf name')
@@ -233,62 +507,221 @@ def scrape_chunk_and_embed(leaf_data):
         p4_link = leaf.get('P4 Link')
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        if leaf_link and leaf_link != 'No Leaf Link':
-            success = False
-            while not success:
-                print(f"Scraping data from: {leaf_link}")
-                scraped_text = scrape_text(leaf_link)
-
-                if scraped_text:
-                    chunks = chunk_text_by_tokens(scraped_text, max_tokens=7000)
-                    print(f"Data for {leaf_name} broken into {len(chunks)} chunks.")
-                    chunk_status = "YES"
-                    
-                    for chunk in chunks:
-                        embedding = None
-                        while embedding is None:
-                            embedding = embed_text_openai(chunk)
-                            if embedding is None:
-                                print("Failed to get embedding, retrying after 60 seconds...")
-                                time.sleep(60)
-                        
-                        embeddings_batch.append({
-                            "id": id_counter,
-                            "combined_chunk": f"Root: {root_name}\nP1: {p1_name}\nP2: {p2_name}\nP3: {p3_name}\nP4: {p4_name}\nLeaf: {leaf_name}\nChunk: {chunk}",
-                            "embedding": embedding,
-                            "metadata": {
-                                "root_name": root_name,
-                                "root_link": root_link,
-                                "p1_name": p1_name,
-                                "p1_link": p1_link,
-                                "p2_name": p2_name,
-                                "p2_link": p2_link,
-                                "p3_name": p3_name,
-                                "p3_link": p3_link,
-                                "p4_name": p4_name,
-                                "p4_link": p4_link,
-                                "leaf_name": leaf_name,
-                                "leaf_link": leaf_link
-                            }
-                        })
-                        id_counter += 1
-
-                        if len(embeddings_batch) >= batch_size:
-                            save_embeddings_to_json(embeddings_batch, file_count)
-                            file_count += 1
-                            embeddings_batch = []
-                    
-                    success = True
-                    log_to_csv(log_filename, leaf_name, leaf_link, chunk_status, "YES", len(chunks), timestamp)
-                else:
-                    print(f"Failed to scrape {leaf_link}, logging error...")
-                    log_error_to_csv(error_log_filename, leaf, "Scraping failed or timed out")
-                    time.sleep(30)
+        scraped_text = get_article_text(leaf_link)
+        if not scraped_text:
+            if page_cache.CACHE_MODE == 'cache-only':
+                return "Not in page cache (cache-only mode)"
+            return "Scraping failed or timed out"
+
+        chunks = chunk_text_by_tokens(scraped_text, max_tokens=embedder.max_chunk_tokens)
+        print(f"Data for {leaf_name} broken into {len(chunks)} chunks.")
+        chunk_status = "YES"
+        previous_chunks = manifest.get(leaf_link, {})
+        leaf_chunks = {}
+        metadata = {
+            "root_name": root_name,
+            "root_link": root_link,
+            "p1_name": p1_name,
+            "p1_link": p1_link,
+            "p2_name": p2_name,
+            "p2_link": p2_link,
+            "p3_name": p3_name,
+            "p3_link": p3_link,
+            "p4_name": p4_name,
+            "p4_link": p4_link,
+            "leaf_name": leaf_name,
+            "leaf_link": leaf_link
+        }
+        # Empty P3/P4 cells come from pandas as NaN, which is not valid JSON for Pinecone
+        metadata = {key: ('' if isinstance(value, float) and math.isnan(value) else value)
+                    for key, value in metadata.items()}
+        if normalized:
+            node_id = make_node_id(metadata)
+            if node_id not in hierarchy_nodes:
+                pending_nodes[node_id] = metadata
+        
+        # Records are only added to the shared batch once the whole leaf embedded,
+        # so a failed leaf can be retried without leaving partial or duplicate chunks
+        pending_chunks = []
+        for chunk_index, chunk in enumerate(chunks):
+            combined_chunk = f"Root: {root_name}\nP1: {p1_name}\nP2: {p2_name}\nP3: {p3_name}\nP4: {p4_name}\nLeaf: {leaf_name}\nChunk: {chunk}"
+            chunk_hash = hash_text(combined_chunk)
+            if deterministic_ids:
+                vector_id = make_vector_id(leaf_link, chunk_index)
+                leaf_chunks[vector_id] = chunk_hash
+                if incremental and previous_chunks.get(vector_id) == chunk_hash:
+                    continue
+            else:
+                vector_id = id_counter + len(pending_chunks)
+            pending_chunks.append((vector_id, chunk, combined_chunk, chunk_hash))
+
+        # One batched call per leaf instead of one request per chunk
+        embeddings = []
+        if pending_chunks:
+            embeddings = retry_policy.retry(lambda: embedder.embed_batch([item[1] for item in pending_chunks]),
+                                            attempts=4, base_delay=15, max_delay=120,
+                                            description=f"embedding of {len(pending_chunks)} chunks of {leaf_name}")
+            if embeddings is None:
+                return "Embedding failed"
+
+        leaf_records = []
+        for (vector_id, chunk, combined_chunk, chunk_hash), embedding in zip(pending_chunks, embeddings):
+            if normalized:
+                # The hierarchy prefix of combined_chunk is rebuilt from the node when needed
+                leaf_records.append({
+                    "id": vector_id,
+                    "node_id": node_id,
+                    "chunk": chunk,
+                    "content_hash": chunk_hash,
+                    "embedding": embedding
+                })
+            else:
+                leaf_records.append({
+                    "id": vector_id,
+                    "combined_chunk": combined_chunk,
+                    "content_hash": chunk_hash,
+                    "embedding": embedding,
+                    "metadata": metadata
+                })
+
+        if not deterministic_ids:
+            id_counter += len(leaf_records)
+        embeddings_batch.extend(leaf_records)
+
+        if incremental:
+            changed = sum(1 for vid, h in leaf_chunks.items() if previous_chunks.get(vid) != h)
+            removed = sum(1 for vid in previous_chunks if vid not in leaf_chunks)
+            print(f"{changed} changed, {removed} removed chunks for {leaf_name}")
+            pending_manifest[leaf_link] = leaf_chunks
+        
+        pending_logs.append((leaf_name, leaf_link, chunk_status, "YES", len(chunks), timestamp))
+        batch_leaves.append((leaf, leaf_records))
+        # Also bounded by leaves, so unchanged leaves (no records) are committed regularly
+        if len(embeddings_batch) >= batch_size or len(batch_leaves) >= batch_size:
+            flush_batch()  # a failed write reports this batch's leaves itself
+        return None
+
+    # Get already processed leaves
+    processed_leaves = set() if incremental else get_processed_leaves()
+    if queue_conn is not None and worker_id is None:
+        worker_id = work_queue.make_worker_id()
+    print(f"Found {len(processed_leaves)} already processed leaves")
+
+    if queue_conn is not None:
+        # Shared queue: every worker enqueues the CSV (duplicates are ignored) and then
+        # leases leaves until none are left; failures go back to the queue, not the error CSV
+        pass_number = None
+        if incremental and not lease_only:
+            pass_number, started = work_queue.start_pass(queue_conn)
+            if started:
+                print(f"Starting incremental pass {pass_number}")
+        feeder = None
+        if not lease_only and total_leaves is not None:
+            added = work_queue.enqueue_leaves(queue_conn, [leaf for leaf in leaf_data
+                                                           if leaf.get('Leaf Link') not in processed_leaves],
+                                              pass_number)
+            print(f"Worker {worker_id} enqueued {added} leaves, queue: {work_queue.queue_stats(queue_conn)}")
+            if incremental:
+                remove_unlisted_leaves(queue_conn, pass_number)
+        elif not lease_only:
+            # Streamed leaves are enqueued as the crawler finds them, on their own connection;
+            # the crawler role (claimed in __main__) is held until the crawl is done
+            def feed_queue():
+                feeder_conn = work_queue.connect(work_queue.WORK_QUEUE_DB)
+                added = 0
+                with work_queue.RoleHeartbeat(work_queue.WORK_QUEUE_DB, CRAWL_ROLE, worker_id):
+                    for leaf in leaf_data:
+                        if leaf.get('Leaf Link') not in processed_leaves:
+                            added += work_queue.enqueue_leaves(feeder_conn, [leaf], pass_number)
+                    print(f"Crawl finished, worker {worker_id} enqueued {added} leaves")
+                    # A crawl that hit fetch errors may have missed leaves, so nothing is removed then
+                    if incremental and leaf_data.complete:
+                        remove_unlisted_leaves(feeder_conn, pass_number)
+                    elif incremental:
+                        print("Crawl was incomplete, keeping vectors of leaves that were not found")
+                feeder_conn.close()
+
+            feeder = threading.Thread(target=feed_queue, daemon=True)
+            feeder.start()
+
+        # Leaves stay leased (and heartbeated) until flush_batch acknowledges their batch
+        with work_queue.LeaseHeartbeat(work_queue.WORK_QUEUE_DB, worker_id) as leases:
+            while True:
+                leaf = work_queue.lease_next(queue_conn, worker_id)
+                if leaf is None:
+                    flush_batch()
+                    if ((feeder is not None and feeder.is_alive()) or work_queue.role_held(queue_conn, CRAWL_ROLE)
+                            or work_queue.waiting_retries(queue_conn)):
+                        # Nothing to lease yet: the crawl (here or in another worker) is still
+                        # discovering leaves, or failed leaves are waiting out their backoff
+                        time.sleep(1)
+                        continue
+                    break
+                leaf_link = leaf.get('Leaf Link')
+                leases.hold(leaf_link)
+                print(f"[{worker_id}] Processing leaf: {leaf.get('Leaf name')}")
+                try:
+                    error = process_leaf(leaf)
+                except Exception as e:
+                    error = f"Unexpected error: {e}"
+                if error:
+                    print(f"Failed {leaf_link}: {error}")
+                    work_queue.fail(queue_conn, leaf_link, worker_id, error)
+                    leases.release(leaf_link)
+
+        print(f"Queue drained: {work_queue.queue_stats(queue_conn)}")
+        return
+
+    current_links = set()
+    for idx, leaf in enumerate(leaf_data):
+        leaf_link = leaf.get('Leaf Link')
+        current_links.add(leaf_link)
         
-        idx += 1
+        # Skip already processed leaves
+        if leaf_link in processed_leaves:
+            print(f"Skipping already processed leaf: {leaf.get('Leaf name')}")
+            continue
+
+        if total_leaves is not None:
+            print(f"Processing leaf {idx + 1} of {total_leaves} ({((idx+1)/total_leaves)*100:.1f}%)")
+        else:
+            print(f"Processing leaf {idx + 1} (crawl {'running' if leaf_data.running else 'finished'})")
+
+        if leaf_link and leaf_link != 'No Leaf Link':
+            # Bounded: a dead link is logged and skipped instead of retried forever
+            error = retry_policy.retry(
+                lambda: process_leaf(leaf),
+                should_retry=lambda error: error is not None and page_cache.CACHE_MODE != 'cache-only',
+                attempts=2, base_delay=15, max_delay=60,
+                description=f"leaf {leaf.get('Leaf name')}"
+            )
+            if error is not None:
+                print(f"Failed to process {leaf_link}: {error}, logging error...")
+                log_error_to_csv(error_log_filename, leaf, error)
+
+    # Leaves that disappeared from the CSV: drop all of their vectors. A crawl that hit
+    # fetch errors may have missed leaves, so nothing is removed after an incomplete one
+    if incremental and not getattr(leaf_data, 'complete', True):
+        print("Crawl was incomplete, keeping vectors of leaves that were not found")
+    elif incremental:
+        for removed_link in [link for link in manifest if link not in current_links and manifest[link]]:
+            print(f"Leaf no longer listed, removing its vectors: {removed_link}")
+            pending_stale.extend(manifest[removed_link])
+            # Keep an empty entry so LOAD.py also drops the leaf's old records from batch files
+            manifest[removed_link] = {}
 
-    if embeddings_batch:
-        save_embeddings_to_json(embeddings_batch, file_count)
+    flush_batch()
+
+def get_next_batch_number():
+    folder_path = "Chunks"
+    numbers = [0]
+    if os.path.exists(folder_path):
+        for filename in os.listdir(folder_path):
+            if filename.startswith("embeddings_batch_") and filename.endswith(".json"):
+                number = filename[len("embeddings_batch_"):-len(".json")]
+                if number.isdigit():
+                    numbers.append(int(number))
+    return max(numbers) + 1
 
 def get_last_processed_id():
     folder_path = "Chunks"
@@ -303,14 +736,39 @@ def get_last_processed_id():
                 with open(file_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     if data:
-                        last_id = max(last_id, max(item["id"] for item in data))
+                        # Incremental runs use string IDs, only sequential ones count here
+                        int_ids = [item["id"] for item in data if isinstance(item["id"], int)]
+                        if int_ids:
+                            last_id = max(last_id, max(int_ids))
             except Exception as e:
                 print(f"Error reading {filename}: {e}")
     return last_id if last_id > 0 else None
 
-# Main execution
-try:
-    scrape_chunk_and_embed(leaf_data)
-finally:
-    driver.quit()
-    print("Browser session closed successfully")
+# Main execution; set WORK_QUEUE_DB to share the crawl with other worker processes/machines,
+# and CRAWL_ROOT_LINK to discover the leaves from the KB itself instead of reading KB.csv
+if __name__ == "__main__":
+    if embedder.name == 'openai' and not openai.api_key:
+        print("Error: OPENAI_API_KEY not found in environment variables")
+        exit(1)
+
+    queue_conn = work_queue.connect(os.getenv('WORK_QUEUE_DB')) if os.getenv('WORK_QUEUE_DB') else None
+    worker_id = work_queue.make_worker_id() if queue_conn is not None else None
+
+    crawl_root = os.getenv('CRAWL_ROOT_LINK')
+    if crawl_root and (queue_conn is None or work_queue.claim_role(queue_conn, CRAWL_ROLE, worker_id)):
+        # Leaves are scraped while discovery continues; the crawled hierarchy is also saved as CSV
+        # CRAWL_FETCH=browser renders the KB's pages in Chrome, for navigation built client-side
+        leaf_data = kb_crawler.LeafStream(crawl_root, output_csv=os.getenv('CRAWL_OUTPUT_CSV', 'KB_crawled.csv'),
+                                          fetch=kb_crawler.make_fetch())
+    elif crawl_root:
+        # Another worker is crawling and feeding the queue, this one only leases leaves
+        print("Another worker holds the crawler role, leasing the leaves it finds")
+        leaf_data = None
+    else:
+        leaf_data = load_leaf_data(csv_filename)
+    try:
+        scrape_chunk_and_embed(leaf_data, queue_conn=queue_conn, worker_id=worker_id)
+    finally:
+        if browser.pages:
+            browser.quit()
+            print("Browser session closed successfully")
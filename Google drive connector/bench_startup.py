@@ -0,0 +1,63 @@
+# Startup-time benchmark for the connector: importing main.py now, against importing it
+# plus every heavy dependency and the YOLO weights up front (what the old module did),
+# and the time to the first extraction of a text file (no heavy imports needed).
+#
+# Usage: python bench_startup.py [runs]
+
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LAZY = "import main"
+EAGER = ("import main, pytesseract, pdfplumber, fitz, pandas, docx, openai; from PIL import Image; "
+         "from ultralytics import YOLO; YOLO(main.YOLO_WEIGHTS)")
+HEAVY_MODULES = ["pytesseract", "pdfplumber", "fitz", "pandas", "docx", "PIL", "ultralytics", "openai"]
+
+
+def time_subprocess(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            print(f"  failed: {result.stderr.strip().splitlines()[-1]}")
+            return None
+    return statistics.median(timings)
+
+
+def first_text_extraction():
+    start = time.perf_counter()
+    sys.path.insert(0, HERE)
+    import main
+    imported = time.perf_counter()
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.write("Quarterly report, see https://example.com/report for details.\n" * 100)
+    try:
+        main.process_file(f.name, {"id": "bench", "name": "notes.txt", "mimeType": "text/plain"})
+    finally:
+        os.remove(f.name)
+    done = time.perf_counter()
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    return imported - start, done - start, loaded
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    lazy = time_subprocess(LAZY, runs)
+    print(f"import main (lazy extractors)      {lazy * 1000:8.0f} ms" if lazy else "import main failed")
+    eager = time_subprocess(EAGER, runs)
+    if eager:
+        print(f"import main + all deps + YOLO      {eager * 1000:8.0f} ms")
+    if lazy and eager:
+        print(f"Startup saved: {(eager - lazy) * 1000:.0f} ms ({eager / lazy:.1f}x)")
+
+    import_time, first_extract, loaded = first_text_extraction()
+    print(f"In-process import {import_time * 1000:.0f} ms, first .txt extraction done at {first_extract * 1000:.0f} ms")
+    print(f"Heavy modules loaded after a text-only run: {loaded or 'none'}")
@@ -1,20 +1,16 @@
 import os
 import io
 import re
+import csv
 import json
-import pytesseract
-import pdfplumber
-import fitz  # PyMuPDF
-import pandas as pd
-from PIL import Image
-from docx import Document
 
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
-from ultralytics import YOLO
-import openai  # (Optional) If you want AI-based refinement for YOLO
+# Heavy extraction dependencies (pytesseract, pdfplumber, PyMuPDF, pandas, Pillow,
+# python-docx, ultralytics, openai) are imported inside the extractors that use them,
+# so a run only pays for the file types it actually meets.
 
 # -------------------------------------------------------------------
 # 1) CONFIGURATION
@@ -24,15 +20,22 @@ SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 EXTRACTION_OUTPUT_FOLDER = "extracted_output"
 DOWNLOAD_FOLDER = "downloads"
 PROCESSED_FILES_LOG = "processed_files.json"
+# Extraction results keyed by Drive md5Checksum, shared by every file id with that content.
+# Bump EXTRACTOR_VERSION whenever an extractor's output changes so older entries are redone.
+EXTRACTION_CACHE_FOLDER = "extraction_cache"
+EXTRACTOR_VERSION = 3
 
 # Tesseract multi-language (adjust as needed)
 TESSERACT_LANGS = "eng"
 
-# YOLO (if needed for object detection)
-model = YOLO("yolov8n.pt")
+# Spreadsheets/CSVs are emitted as blocks of this many rows, each repeating the header
+TABULAR_ROWS_PER_BLOCK = int(os.getenv("TABULAR_ROWS_PER_BLOCK", "50"))
+
+# YOLO (if needed for object detection); weights are loaded on the first image
+YOLO_WEIGHTS = "yolov8n.pt"
+_yolo_model = None
 
 # Optional OpenAI config for refining YOLO output
-openai.api_key = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = "gpt-3.5-turbo"
 
 # -------------------------------------------------------------------
@@ -50,7 +53,9 @@ def authenticate_google_drive():
 def fetch_drive_files(creds):
     """
     Paginated retrieval of all files from Google Drive.
-    Also request 'webViewLink' for a direct link to the file (source_url).
+    Also request 'webViewLink' for a direct link to the file (source_url),
+    and 'md5Checksum'/'size' so unchanged content can be recognised without downloading.
+    (Google-native files such as Docs have no md5Checksum.)
     """
     service = build("drive", "v3", credentials=creds)
     all_files = []
@@ -60,7 +65,7 @@ def fetch_drive_files(creds):
         response = service.files().list(
             pageSize=100,
             pageToken=page_token,
-            fields="nextPageToken, files(id, name, mimeType, modifiedTime, webViewLink)"
+            fields="nextPageToken, files(id, name, mimeType, modifiedTime, webViewLink, md5Checksum, size)"
         ).execute()
 
         files = response.get("files", [])
@@ -86,6 +91,13 @@ def download_file(service, file_id, file_name):
 # 3) EXTRACTION UTILITIES
 # -------------------------------------------------------------------
 
+# Errors swallowed while extracting the current file; a partial result is not cached
+_extraction_errors = []
+
+def report_extraction_error(message):
+    print(message)
+    _extraction_errors.append(message)
+
 def regex_link_extractor(text):
     """Fallback regex to find URLs in any raw text."""
     pattern = r'(https?://[^\s]+)'
@@ -93,6 +105,7 @@ def regex_link_extractor(text):
     return list(set(found))  # unique
 
 def extract_text_from_pdf(pdf_path):
+    import pdfplumber
     text = ""
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
@@ -105,6 +118,9 @@ def extract_images_from_pdf(pdf_path):
     """
     Extract images from PDF using PyMuPDF, then OCR each image.
     """
+    import fitz  # PyMuPDF
+    import pytesseract
+    from PIL import Image
     doc = fitz.open(pdf_path)
     ocr_texts = []
     for page in doc:
@@ -118,13 +134,14 @@ def extract_images_from_pdf(pdf_path):
                 if text.strip():
                     ocr_texts.append(text)
             except Exception as e:
-                print(f"Error extracting image from PDF: {e}")
+                report_extraction_error(f"Error extracting image from PDF: {e}")
     return "\n".join(ocr_texts)
 
 def extract_hyperlinks_from_pdf(pdf_path):
     """
     Extract hyperlinks from PDF with PyMuPDF.
     """
+    import fitz  # PyMuPDF
     doc = fitz.open(pdf_path)
     links = []
     for page in doc:
@@ -135,6 +152,7 @@ def extract_hyperlinks_from_pdf(pdf_path):
 
 def extract_text_from_docx(docx_path):
     """Extract text from DOCX using python-docx."""
+    from docx import Document
     doc = Document(docx_path)
     return "\n".join(paragraph.text for paragraph in doc.paragraphs)
 
@@ -143,6 +161,7 @@ def extract_hyperlinks_from_docx(docx_path):
     Not all DOCX files store hyperlinks in run.hyperlink.
     This is partial coverage. 
     """
+    from docx import Document
     doc = Document(docx_path)
     links = []
     for para in doc.paragraphs:
@@ -155,6 +174,9 @@ def extract_images_from_docx(docx_path):
     """
     Extract images from DOCX and OCR them.
     """
+    import pytesseract
+    from PIL import Image
+    from docx import Document
     doc = Document(docx_path)
     results = []
     for rel in doc.part.rels:
@@ -167,47 +189,130 @@ def extract_images_from_docx(docx_path):
                 if text.strip():
                     results.append(text)
             except Exception as e:
-                print(f"Error extracting DOCX image: {e}")
+                report_extraction_error(f"Error extracting DOCX image: {e}")
     return "\n".join(results)
 
 def extract_text_from_txt(txt_path):
     with open(txt_path, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
 
+def format_row(values):
+    """One table row as 'a | b | c', with trailing empty cells dropped."""
+    cells = ["" if value is None else str(value).strip() for value in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+def iter_row_blocks(rows, title, rows_per_block=TABULAR_ROWS_PER_BLOCK):
+    """
+    Stream rows into compact text blocks of rows_per_block rows.
+    The first non-empty row is the header and is repeated at the top of every
+    block, so each block stands on its own when chunked. Rows are consumed one
+    block at a time; callers collect the blocks of a file (see tabular_result).
+    """
+    header = None
+    block = []
+    first_row = 0
+    emitted = False
+    for row_number, values in enumerate(rows, start=1):
+        line = format_row(values)
+        if not line.replace("|", "").strip():
+            continue
+        if header is None:
+            header = line
+            continue
+        if not block:
+            first_row = row_number
+        block.append(line)
+        if len(block) >= rows_per_block:
+            yield f"{title} (rows {first_row}-{row_number})\n{header}\n" + "\n".join(block)
+            emitted = True
+            block = []
+    if block:
+        yield f"{title} (rows {first_row}-{row_number})\n{header}\n" + "\n".join(block)
+    elif header is not None and not emitted:
+        yield f"{title}\n{header}"
+
 def extract_text_from_xlsx(xlsx_path):
-    """For Excel files. If CSV, you can parse with read_csv or rename."""
+    """
+    For Excel files: every sheet is read row by row with openpyxl in read-only
+    mode and returned as a list of header-prefixed row blocks.
+    """
+    from openpyxl import load_workbook
     try:
-        df = pd.read_excel(xlsx_path)
-        return df.to_string(index=False)
+        workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
     except Exception as e:
-        print(f"Error reading Excel file: {xlsx_path}, {e}")
-        return ""
+        report_extraction_error(f"Error reading Excel file: {xlsx_path}, {e}")
+        return []
+    blocks = []
+    try:
+        for sheet in workbook.worksheets:
+            blocks.extend(iter_row_blocks(sheet.iter_rows(values_only=True), f"Sheet: {sheet.title}"))
+    except Exception as e:
+        report_extraction_error(f"Error reading Excel file: {xlsx_path}, {e}")
+    finally:
+        workbook.close()
+    return blocks
+
+def extract_text_from_xls(xls_path):
+    """Legacy binary .xls workbooks (which openpyxl cannot read) go through xlrd, one sheet at a time."""
+    try:
+        import xlrd
+        workbook = xlrd.open_workbook(xls_path, on_demand=True)
+    except Exception as e:
+        report_extraction_error(f"Error reading Excel file: {xls_path}, {e}")
+        return []
+    blocks = []
+    try:
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            rows = ([cell.value for cell in row] for row in sheet.get_rows())
+            blocks.extend(iter_row_blocks(rows, f"Sheet: {sheet.name}"))
+            workbook.unload_sheet(index)
+    except Exception as e:
+        report_extraction_error(f"Error reading Excel file: {xls_path}, {e}")
+    finally:
+        workbook.release_resources()
+    return blocks
 
 def extract_text_from_csv(csv_path):
+    """CSV files are streamed with the csv module into the same row blocks as Excel sheets."""
+    blocks = []
     try:
-        df = pd.read_csv(csv_path)
-        return df.to_string(index=False)
+        with open(csv_path, "r", newline="", encoding="utf-8", errors="replace") as f:
+            title = f"File: {os.path.basename(csv_path)}"
+            blocks.extend(iter_row_blocks(csv.reader(f), title))
     except Exception as e:
-        print(f"Error reading CSV: {csv_path}, {e}")
-        return ""
+        report_extraction_error(f"Error reading CSV: {csv_path}, {e}")
+    return blocks
 
 def extract_text_from_image(image_path):
     """OCR for standalone images."""
+    import pytesseract
+    from PIL import Image
     try:
         img = Image.open(image_path)
         return pytesseract.image_to_string(img, lang=TESSERACT_LANGS)
     except Exception as e:
-        print(f"Error OCR on image: {e}")
+        report_extraction_error(f"Error OCR on image: {e}")
         return ""
 
 # -------------------------------------------------------------------
 # 4) OPTIONAL YOLO + AI REFINEMENT
 # -------------------------------------------------------------------
 
+def get_yolo_model():
+    """Load the YOLO weights once, on the first image that needs them."""
+    global _yolo_model
+    if _yolo_model is None:
+        from ultralytics import YOLO
+        _yolo_model = YOLO(YOLO_WEIGHTS)
+    return _yolo_model
+
 def detect_objects_in_image(image_path):
     objects_found = []
     try:
-        results = model(image_path)
+        results = get_yolo_model()(image_path)
         for r in results:
             if r.boxes is not None:
                 for box in r.boxes:
@@ -215,7 +320,7 @@ def detect_objects_in_image(image_path):
                     class_name = results[0].names[class_id]
                     objects_found.append(class_name)
     except Exception as e:
-        print(f"Error running YOLO: {e}")
+        report_extraction_error(f"Error running YOLO: {e}")
     return objects_found
 
 def refine_yolo_output_with_ai(objects_detected):
@@ -227,6 +332,8 @@ def refine_yolo_output_with_ai(objects_detected):
         "Provide a short descriptive summary.but if it is a flow chart please describe properly in full length"
     )
     try:
+        import openai
+        openai.api_key = os.getenv("OPENAI_API_KEY")
         response = openai.ChatCompletion.create(
             model=OPENAI_MODEL,
             messages=[{"role": "user", "content": prompt}],
@@ -234,7 +341,7 @@ def refine_yolo_output_with_ai(objects_detected):
         )
         return response["choices"][0]["message"]["content"]
     except Exception as e:
-        print(f"Error refining YOLO with AI: {e}")
+        report_extraction_error(f"Error refining YOLO with AI: {e}")
         return ""
 
 # -------------------------------------------------------------------
@@ -254,12 +361,123 @@ def extract_from_google_docs(file_id):
     return "Placeholder for Google Docs text."
 
 # -------------------------------------------------------------------
-# 6) MAIN EXTRACTION LOGIC (NO CHUNKING)
+# 6) EXTRACTOR REGISTRY
+# -------------------------------------------------------------------
+
+# File extension -> extractor wins first (Drive often reports a .csv as text/plain), then
+# the exact mime type, then the mime prefix ("image/").
+# An extractor takes (file_path, file_info) and returns the fields it fills in.
+EXTRACTORS = {}
+PREFIX_EXTRACTORS = {}
+EXTENSION_EXTRACTORS = {}
+
+def register_extractor(mime_types=(), prefixes=(), extensions=()):
+    def decorator(func):
+        for mime_type in mime_types:
+            EXTRACTORS[mime_type] = func
+        for prefix in prefixes:
+            PREFIX_EXTRACTORS[prefix] = func
+        for extension in extensions:
+            EXTENSION_EXTRACTORS[extension] = func
+        return func
+    return decorator
+
+def find_extractor(mime_type, file_name):
+    for extension, extractor in EXTENSION_EXTRACTORS.items():
+        if file_name.endswith(extension):
+            return extractor
+    if mime_type in EXTRACTORS:
+        return EXTRACTORS[mime_type]
+    for prefix, extractor in PREFIX_EXTRACTORS.items():
+        if mime_type.startswith(prefix):
+            return extractor
+    return None
+
+def text_with_links(text):
+    return {"text": text, "hyperlinks": regex_link_extractor(text)}
+
+def tabular_result(blocks):
+    """
+    Row blocks joined by blank lines, with links found block by block so the
+    regex never runs over a whole large sheet at once.
+    """
+    links = set()
+    for block in blocks:
+        links.update(regex_link_extractor(block))
+    return {"text": "\n\n".join(blocks), "hyperlinks": list(links)}
+
+@register_extractor(mime_types=["application/pdf"])
+def pdf_extractor(file_path, file_info):
+    return {
+        "text": extract_text_from_pdf(file_path),
+        "images_text": extract_images_from_pdf(file_path),
+        "hyperlinks": extract_hyperlinks_from_pdf(file_path)
+    }
+
+@register_extractor(mime_types=["application/vnd.openxmlformats-officedocument.wordprocessingml.document"])
+def docx_extractor(file_path, file_info):
+    return {
+        "text": extract_text_from_docx(file_path),
+        "images_text": extract_images_from_docx(file_path),
+        "hyperlinks": extract_hyperlinks_from_docx(file_path)
+    }
+
+@register_extractor(mime_types=["application/msword"], extensions=[".doc"])
+def doc_extractor(file_path, file_info):
+    # Typically use 'textract' or other tools for .doc
+    # For now, fallback
+    return text_with_links("Placeholder for .doc extraction. Use e.g. textract.")
+
+@register_extractor(mime_types=["text/csv"], extensions=[".csv"])
+def csv_extractor(file_path, file_info):
+    return tabular_result(extract_text_from_csv(file_path))
+
+@register_extractor(mime_types=["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"])
+def xlsx_extractor(file_path, file_info):
+    return tabular_result(extract_text_from_xlsx(file_path))
+
+# Drive also labels CSVs application/vnd.ms-excel; those are caught by the .csv rule above
+@register_extractor(mime_types=["application/vnd.ms-excel"], extensions=[".xls"])
+def xls_extractor(file_path, file_info):
+    return tabular_result(extract_text_from_xls(file_path))
+
+@register_extractor(mime_types=["text/plain"])
+def txt_extractor(file_path, file_info):
+    return text_with_links(extract_text_from_txt(file_path))
+
+@register_extractor(prefixes=["image/"])
+def image_extractor(file_path, file_info):
+    # OCR + YOLO
+    extracted = text_with_links(extract_text_from_image(file_path))
+    objects_found = detect_objects_in_image(file_path)
+    extracted["detected_objects"] = objects_found
+    extracted["objects_ai_refined"] = refine_yolo_output_with_ai(objects_found)
+    return extracted
+
+@register_extractor(mime_types=["application/vnd.openxmlformats-officedocument.presentationml.presentation"])
+def pptx_extractor(file_path, file_info):
+    # PPTX placeholder
+    return text_with_links(extract_from_pptx(file_path))
+
+@register_extractor(prefixes=["video/"])
+def video_extractor(file_path, file_info):
+    # Video placeholder
+    return text_with_links(extract_from_video(file_path))
+
+@register_extractor(mime_types=["application/vnd.google-apps.document"])
+def google_docs_extractor(file_path, file_info):
+    # Google Docs placeholder
+    return text_with_links(extract_from_google_docs(file_info["id"]))
+
+# -------------------------------------------------------------------
+# 7) MAIN EXTRACTION LOGIC (NO CHUNKING)
 # -------------------------------------------------------------------
 
-def process_file(file_path, file_info):
+def process_file(file_path, file_info, errors=None):
     """
     Extracts raw text, images text, hyperlinks, detected objects, etc.
+    using the extractor registered for the file's mime type.
+    Errors hit along the way are appended to errors (if given).
     Returns a dictionary with:
     {
       "text": "",
@@ -280,73 +498,23 @@ def process_file(file_path, file_info):
         "objects_ai_refined": ""
     }
 
-    try:
-        if mime_type == "application/pdf":
-            extracted_data["text"] = extract_text_from_pdf(file_path)
-            extracted_data["images_text"] = extract_images_from_pdf(file_path)
-            extracted_data["hyperlinks"] = extract_hyperlinks_from_pdf(file_path)
-
-        elif mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            extracted_data["text"] = extract_text_from_docx(file_path)
-            extracted_data["images_text"] = extract_images_from_docx(file_path)
-            extracted_data["hyperlinks"] = extract_hyperlinks_from_docx(file_path)
-
-        elif mime_type == "application/msword" or file_name.endswith(".doc"):
-            # Typically use 'textract' or other tools for .doc
-            # For now, fallback
-            extracted_data["text"] = "Placeholder for .doc extraction. Use e.g. textract."
-            extracted_data["hyperlinks"] = regex_link_extractor(extracted_data["text"])
-
-        elif mime_type in ["text/csv", "application/vnd.ms-excel"] or file_name.endswith(".csv"):
-            extracted_data["text"] = extract_text_from_csv(file_path)
-            extracted_data["hyperlinks"] = regex_link_extractor(extracted_data["text"])
-
-        elif mime_type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
-            extracted_data["text"] = extract_text_from_xlsx(file_path)
-            extracted_data["hyperlinks"] = regex_link_extractor(extracted_data["text"])
-
-        elif mime_type == "text/plain":
-            extracted_data["text"] = extract_text_from_txt(file_path)
-            extracted_data["hyperlinks"] = regex_link_extractor(extracted_data["text"])
-
-        elif mime_type.startswith("image/"):
-            # OCR + YOLO
-            extracted_data["text"] = extract_text_from_image(file_path)
-            objects_found = detect_objects_in_image(file_path)
-            extracted_data["detected_objects"] = objects_found
-            extracted_data["objects_ai_refined"] = refine_yolo_output_with_ai(objects_found)
-            extracted_data["hyperlinks"] = regex_link_extractor(extracted_data["text"])
-
-        elif mime_type == "application/vnd.openxmlformats-officedocument.presentationml.presentation":
-            # PPTX placeholder
-            ppt_text = extract_from_pptx(file_path)
-            extracted_data["text"] = ppt_text
-            extracted_data["hyperlinks"] = regex_link_extractor(ppt_text)
-
-        elif mime_type.startswith("video/"):
-            # Video placeholder
-            vid_text = extract_from_video(file_path)
-            extracted_data["text"] = vid_text
-            extracted_data["hyperlinks"] = regex_link_extractor(vid_text)
-
-        elif mime_type == "application/vnd.google-apps.document":
-            # Google Docs placeholder
-            doc_text = extract_from_google_docs(file_info["id"])
-            extracted_data["text"] = doc_text
-            extracted_data["hyperlinks"] = regex_link_extractor(doc_text)
-
-        else:
-            print(f"[!] Unsupported or unknown file type: {mime_type}")
-            extracted_data["text"] = ""
-            extracted_data["hyperlinks"] = []
+    extractor = find_extractor(mime_type, file_name)
+    if extractor is None:
+        print(f"[!] Unsupported or unknown file type: {mime_type}")
+        return extracted_data
 
+    del _extraction_errors[:]
+    try:
+        extracted_data.update(extractor(file_path, file_info))
     except Exception as e:
-        print(f"Error processing {file_info['name']}: {e}")
+        report_extraction_error(f"Error processing {file_info['name']}: {e}")
+    if errors is not None:
+        errors.extend(_extraction_errors)
 
     return extracted_data
 
 # -------------------------------------------------------------------
-# 7) PERSISTENCE / LOG
+# 8) PERSISTENCE / LOG
 # -------------------------------------------------------------------
 
 def load_processed_files():
@@ -359,13 +527,46 @@ def save_processed_files(data):
     with open(PROCESSED_FILES_LOG, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4)
 
+def load_cached_extraction(md5_checksum, mime_type):
+    """
+    Return the cached extraction for this content checksum, or None.
+    Only reused for the same mime type, since that decides which extractor ran,
+    and the same EXTRACTOR_VERSION.
+    """
+    if not md5_checksum:
+        return None
+    cache_path = os.path.join(EXTRACTION_CACHE_FOLDER, f"{md5_checksum}.json")
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except Exception as e:
+        print(f"Error reading extraction cache {cache_path}: {e}")
+        return None
+    if entry.get("mime_type") != mime_type or entry.get("extractor_version") != EXTRACTOR_VERSION:
+        return None
+    return entry["extracted_content"]
+
+def save_cached_extraction(md5_checksum, mime_type, extracted_data):
+    if not md5_checksum:
+        return
+    cache_path = os.path.join(EXTRACTION_CACHE_FOLDER, f"{md5_checksum}.json")
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"mime_type": mime_type, "extractor_version": EXTRACTOR_VERSION,
+                       "extracted_content": extracted_data}, f, indent=4)
+    except Exception as e:
+        print(f"Error writing extraction cache {cache_path}: {e}")
+
 # -------------------------------------------------------------------
-# 8) MAIN (EXTRACTION-ONLY) PIPELINE
+# 9) MAIN (EXTRACTION-ONLY) PIPELINE
 # -------------------------------------------------------------------
 
 def main():
     os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
     os.makedirs(EXTRACTION_OUTPUT_FOLDER, exist_ok=True)
+    os.makedirs(EXTRACTION_CACHE_FOLDER, exist_ok=True)
 
     creds = authenticate_google_drive()
     files, service = fetch_drive_files(creds)
@@ -378,25 +579,43 @@ def main():
         mime_type = file_info["mimeType"]
         modified_time = file_info.get("modifiedTime", "")
         source_url = file_info.get("webViewLink", "")
+        md5_checksum = file_info.get("md5Checksum", "")
 
-        # Skip if unchanged
+        # Skip if unchanged (same modifiedTime, or touched but same content checksum)
         if file_id in processed_files:
             prev_mod_time = processed_files[file_id].get("modifiedTime", "")
+            prev_checksum = processed_files[file_id].get("md5Checksum", "")
             if modified_time <= prev_mod_time:
                 print(f"Skipping unchanged file: {file_name}")
                 continue
+            if md5_checksum and md5_checksum == prev_checksum:
+                print(f"Skipping touched but unchanged file: {file_name}")
+                processed_files[file_id]["modifiedTime"] = modified_time
+                save_processed_files(processed_files)
+                continue
 
-        print(f"\nExtracting: {file_name} ({mime_type})")
+        # Identical content already extracted (copies, moves): reuse it without downloading
+        local_path = None
+        extracted_data = load_cached_extraction(md5_checksum, mime_type)
+        if extracted_data is not None:
+            print(f"\nReusing cached extraction for: {file_name} (md5 {md5_checksum})")
+        else:
+            print(f"\nExtracting: {file_name} ({mime_type})")
 
-        # Download
-        try:
-            local_path = download_file(service, file_id, file_name)
-        except Exception as e:
-            print(f"Error downloading {file_name}: {e}")
-            continue
+            # Download
+            try:
+                local_path = download_file(service, file_id, file_name)
+            except Exception as e:
+                print(f"Error downloading {file_name}: {e}")
+                continue
 
-        # Extract
-        extracted_data = process_file(local_path, file_info)
+            # Extract
+            errors = []
+            extracted_data = process_file(local_path, file_info, errors)
+            if errors:
+                print(f"Not caching the extraction of {file_name}: {len(errors)} error(s)")
+            else:
+                save_cached_extraction(md5_checksum, mime_type, extracted_data)
 
         # Build final record
         # (No chunking; purely extraction)
@@ -420,15 +639,17 @@ def main():
         # Mark as processed
         processed_files[file_id] = {
             "file_name": file_name,
-            "modifiedTime": modified_time
+            "modifiedTime": modified_time,
+            "md5Checksum": md5_checksum
         }
         save_processed_files(processed_files)
 
         # Cleanup downloaded file
-        try:
-            os.remove(local_path)
-        except Exception as e:
-            print(f"Error cleaning up {local_path}: {e}")
+        if local_path:
+            try:
+                os.remove(local_path)
+            except Exception as e:
+                print(f"Error cleaning up {local_path}: {e}")
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,6 @@
 import os
 import json
+import math
 import requests
 from dotenv import load_dotenv
 
@@ -14,51 +15,172 @@ PINECONE_NAMESPACE = "ZOHO_Analytics"  # Set namespace directly here
 # Folder containing vector data in JSON format
 CHUNK_FOLDER = "./Chunks"
 
+# Written by ET.py in incremental mode
+CHUNK_MANIFEST = "chunk_manifest.json"
+STALE_IDS_FILE = "stale_ids.json"
+
+# Hierarchy node table written by ET.py with METADATA_LAYOUT=normalized
+HIERARCHY_NODES_FILE = os.path.join(CHUNK_FOLDER, "hierarchy_nodes.json")
+
+# Embedding backend/model/dimensions recorded by ET.py
+EMBEDDING_INFO_FILE = os.path.join(CHUNK_FOLDER, "embedding_info.json")
+
+# Metadata sent to Pinecone for normalized records: only what queries filter on plus the
+# node_id to look the rest up. Set PINECONE_METADATA_FIELDS (comma separated) to override;
+# inline records are sent with their full metadata unless it is set.
+DEFAULT_NORMALIZED_FIELDS = ["node_id", "root_name", "p1_name", "p2_name", "p3_name",
+                             "p4_name", "leaf_name", "leaf_link"]
+METADATA_FIELDS = [field.strip() for field in os.getenv("PINECONE_METADATA_FIELDS", "").split(",") if field.strip()]
+
+# Batch files already upserted; set LOAD_ALL=1 to upload every batch again
+LOADED_BATCHES_FILE = "loaded_batches.json"
+LOAD_ALL = os.getenv("LOAD_ALL", "0") == "1"
+
+def read_json(path, default):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return default
+
+def batch_number(file_name):
+    number = file_name[len("embeddings_batch_"):-len(".json")]
+    return int(number) if number.isdigit() else 0
+
+# Full metadata of a record, expanding normalized records through the node table
+def expand_metadata(item, nodes):
+    if "node_id" in item:
+        metadata = dict(nodes.get(item["node_id"], {}))
+        metadata["node_id"] = item["node_id"]
+        return metadata
+    return item.get("metadata", {})
+
+# Pinecone rejects null metadata values, and NaN (empty CSV cells read by pandas) is not valid JSON
+def is_empty_value(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def select_metadata(item, metadata):
+    fields = METADATA_FIELDS or (DEFAULT_NORMALIZED_FIELDS if "node_id" in item else list(metadata))
+    return {field: metadata[field] for field in fields if not is_empty_value(metadata.get(field))}
+
 # Function to load vectors from JSON files in the folder
-def load_vectors_from_folder(folder_path):
-    vectors = []
-    for file_name in os.listdir(folder_path):
+def load_vectors_from_folder(folder_path, skip_files=(), manifest=None, nodes=None, dimensions=None):
+    nodes = nodes or {}
+    # Later batches win when the same ID was re-embedded by an incremental run
+    vectors_by_id = {}
+    file_names = sorted(
+        (name for name in os.listdir(folder_path)
+         if name.startswith("embeddings_batch_") and name.endswith(".json")),
+        key=batch_number
+    )
+    loaded_files = []
+    for file_name in file_names:
+        if file_name in skip_files:
+            continue
         file_path = os.path.join(folder_path, file_name)
-        if file_name.endswith(".json"):  # Ensure it's a JSON file
-            with open(file_path, "r", encoding="utf-8") as f:  # Use UTF-8 encoding
-                data = json.load(f)  # Load JSON content
-                for item in data:
-                    if 'id' not in item or 'embedding' not in item:
-                        raise ValueError("Each vector must have an 'id' and 'embedding' field.")
-                    
-                    # Prepare vector for upsert
-                    vector = {
-                        "id": str(item["id"]),  # Ensure the id is a string
-                        "values": item["embedding"],  # Use the embedding values
-                        "metadata": item.get("metadata", {})  # Include metadata if present
-                    }
-                    vectors.append(vector)
-    return vectors
-
-# Load vectors from the chunk folder
-vectors = load_vectors_from_folder(CHUNK_FOLDER)
-
-# Construct the request URL
-url = f"{PINECONE_INDEX_HOST}/vectors/upsert"
-
-# Prepare the request headers
-headers = {
-    "Api-Key": PINECONE_API_KEY,
-    "Content-Type": "application/json",
-    "X-Pinecone-API-Version": "2024-07",
-}
-
-# Prepare the request body with the namespace added
-data = {
-    "namespace": PINECONE_NAMESPACE,  # Include the namespace here
-    "vectors": vectors
-}
-
-# Send the upsert request to Pinecone
-response = requests.post(url, headers=headers, json=data)
-
-# Check the response status
-if response.status_code == 200:
-    print(f"Successfully upserted {len(vectors)} vectors into Pinecone.")
-else:
-    print(f"Failed to upsert vectors. Status code: {response.status_code}, Message: {response.text}")
+        with open(file_path, "r", encoding="utf-8") as f:  # Use UTF-8 encoding
+            data = json.load(f)  # Load JSON content
+        for item in data:
+            if 'id' not in item or 'embedding' not in item:
+                raise ValueError("Each vector must have an 'id' and 'embedding' field.")
+            if dimensions and len(item["embedding"]) != dimensions:
+                raise ValueError(f"Vector {item['id']} in {file_name} has {len(item['embedding'])} "
+                                 f"dimensions, expected {dimensions}.")
+
+            metadata = expand_metadata(item, nodes)
+
+            # Drop superseded or deleted chunks of leaves tracked by the incremental manifest,
+            # including records from full-mode runs, which have no content_hash
+            leaf_chunks = manifest.get(metadata.get("leaf_link")) if manifest else None
+            if leaf_chunks is not None and (item.get("content_hash") is None or
+                                            leaf_chunks.get(str(item["id"])) != item["content_hash"]):
+                continue
+
+            # Prepare vector for upsert
+            vectors_by_id[str(item["id"])] = {
+                "id": str(item["id"]),  # Ensure the id is a string
+                "values": item["embedding"],  # Use the embedding values
+                "metadata": select_metadata(item, metadata)  # Include metadata if present
+            }
+        loaded_files.append(file_name)
+    return list(vectors_by_id.values()), loaded_files
+
+# Delete vectors for chunks that were removed or superseded since the last load
+def delete_stale_vectors(headers, live_ids=()):
+    stale_ids = [vid for vid in read_json(STALE_IDS_FILE, []) if vid not in live_ids]
+    if not stale_ids:
+        return
+    delete_url = f"{PINECONE_INDEX_HOST}/vectors/delete"
+    remaining = []
+    for start in range(0, len(stale_ids), 1000):  # Pinecone accepts up to 1000 IDs per delete
+        id_group = stale_ids[start:start + 1000]
+        delete_response = requests.post(delete_url, headers=headers,
+                                        json={"namespace": PINECONE_NAMESPACE, "ids": id_group})
+        if delete_response.status_code == 200:
+            print(f"Deleted {len(id_group)} stale vectors from Pinecone.")
+        else:
+            print(f"Failed to delete stale vectors. Status code: {delete_response.status_code}, Message: {delete_response.text}")
+            remaining.extend(id_group)
+    with open(STALE_IDS_FILE, "w", encoding="utf-8") as f:
+        json.dump(remaining, f, indent=4)
+
+def main():
+    # {leaf_link: {vector_id: chunk_hash}}; removed leaves are kept with no chunks
+    manifest = read_json(CHUNK_MANIFEST, None)
+
+    loaded_batches = [] if LOAD_ALL else read_json(LOADED_BATCHES_FILE, [])
+    embedding_info = read_json(EMBEDDING_INFO_FILE, {})
+    dimensions = embedding_info.get("dimensions")
+
+    # Load vectors from the chunk folder
+    vectors, new_batches = load_vectors_from_folder(CHUNK_FOLDER, set(loaded_batches), manifest,
+                                                   read_json(HIERARCHY_NODES_FILE, {}), dimensions)
+
+    # Construct the request URL
+    url = f"{PINECONE_INDEX_HOST}/vectors/upsert"
+
+    # Prepare the request headers
+    headers = {
+        "Api-Key": PINECONE_API_KEY,
+        "Content-Type": "application/json",
+        "X-Pinecone-API-Version": "2024-07",
+    }
+
+    # The index must have been created with the same dimension as the embedding model
+    if dimensions:
+        stats_response = requests.post(f"{PINECONE_INDEX_HOST}/describe_index_stats", headers=headers, json={})
+        if stats_response.status_code == 200:
+            index_dimension = stats_response.json().get("dimension")
+            if index_dimension and index_dimension != dimensions:
+                print(f"Error: Pinecone index has dimension {index_dimension} but chunks were embedded with "
+                      f"{embedding_info.get('model')} ({dimensions} dimensions). Aborting upsert.")
+                return
+        else:
+            print(f"Could not read index stats to validate dimensions: {stats_response.status_code}")
+
+    # Deletes go first: an ID can be stale from an earlier run and live again in this
+    # one, and deleting after the upsert would remove the new vector
+    live_ids = {vid for chunks in (manifest or {}).values() for vid in chunks}
+    delete_stale_vectors(headers, live_ids)
+
+    # Prepare the request body with the namespace added
+    data = {
+        "namespace": PINECONE_NAMESPACE,  # Include the namespace here
+        "vectors": vectors
+    }
+
+    # Send the upsert request to Pinecone
+    if not vectors:
+        print("No new vectors to upsert.")
+    else:
+        response = requests.post(url, headers=headers, json=data)
+
+        # Check the response status
+        if response.status_code == 200:
+            print(f"Successfully upserted {len(vectors)} vectors into Pinecone.")
+            with open(LOADED_BATCHES_FILE, "w", encoding="utf-8") as f:
+                json.dump(sorted(set(loaded_batches) | set(new_batches), key=batch_number), f, indent=4)
+        else:
+            print(f"Failed to upsert vectors. Status code: {response.status_code}, Message: {response.text}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Page-load time and memory of the default vs lean Chrome profiles on local fixture pages.
+# Each fixture article references images, web fonts, a stylesheet, a video and a
+# "tracker" script; every non-HTML request is served with an artificial delay.
+# Needs Chrome/chromedriver and psutil.
+#
+# Usage: python bench_browser.py [pages] [asset_delay_ms]
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from browser_profile import BrowserSession, browser_rss
+from html_extract import CONTAINER_CLASS
+
+
+def write_fixture_site(folder, pages):
+    with open(os.path.join(folder, 'site.css'), 'w') as f:
+        f.write('body { font-family: KB; }\n' * 2000)
+    os.makedirs(os.path.join(folder, 'googletagmanager.com'), exist_ok=True)
+    with open(os.path.join(folder, 'googletagmanager.com', 'gtm.js'), 'w') as f:
+        f.write('var tracked = true;\n')
+    for name, size in [('font.woff2', 120_000), ('video.mp4', 2_000_000)]:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(os.urandom(size))
+    for i in range(20):
+        with open(os.path.join(folder, f'img{i}.png'), 'wb') as f:
+            f.write(os.urandom(60_000))
+
+    for page in range(pages):
+        images = ''.join(f'<img src="/img{i}.png?p={page}">' for i in range(20))
+        body = ''.join(f'<h2>Section {s}</h2><p>{"Zoho Analytics article text. " * 30}</p>' for s in range(8))
+        with open(os.path.join(folder, f'article{page}.html'), 'w') as f:
+            f.write(f'<html><head><link rel="stylesheet" href="/site.css?p={page}">'
+                    f'<style>@font-face {{ font-family: KB; src: url(/font.woff2?p={page}); }}</style>'
+                    f'<script src="/googletagmanager.com/gtm.js?p={page}"></script></head>'
+                    f'<body>{images}<video src="/video.mp4?p={page}" autoplay muted></video>'
+                    f'<div class="{CONTAINER_CLASS}">{body}</div></body></html>')
+
+
+class SlowAssetHandler(SimpleHTTPRequestHandler):
+    asset_delay = 0.05
+
+    def do_GET(self):
+        if not self.path.split('?')[0].endswith('.html'):
+            time.sleep(self.asset_delay)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def run_profile(profile, base_url, pages):
+    with tempfile.TemporaryDirectory() as profile_dir:
+        session = BrowserSession(profile=profile, profile_dir=profile_dir, recycle_pages=0)
+        driver = session.driver
+        load_times, peak_rss = [], 0
+        try:
+            for page in range(pages):
+                start = time.perf_counter()
+                driver.get(f'{base_url}/article{page}.html')
+                WebDriverWait(driver, 30).until(lambda d: d.find_elements(By.CLASS_NAME, CONTAINER_CLASS))
+                load_times.append(time.perf_counter() - start)
+                peak_rss = max(peak_rss, browser_rss(driver))
+        finally:
+            session.quit()
+    average = sum(load_times) / len(load_times)
+    print(f"{profile:<8} avg load {average * 1000:8.1f} ms   peak RSS {peak_rss / 2**20:8.1f} MiB")
+    return average
+
+
+if __name__ == '__main__':
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    SlowAssetHandler.asset_delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+    with tempfile.TemporaryDirectory() as site:
+        write_fixture_site(site, pages)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(SlowAssetHandler, directory=site))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        try:
+            default = run_profile('default', base_url, pages)
+            lean = run_profile('lean', base_url, pages)
+            print(f"Lean profile speed-up: {default / lean:.1f}x")
+        finally:
+            server.shutdown()
@@ -0,0 +1,96 @@
+# Crawls a generated fixture KB served from a local HTTP server, checks the rows
+# against the fixture's known hierarchy and compares sequential vs concurrent discovery.
+# Every page carries a sidebar linking all top-level categories (as the real KB does),
+# so URL dedupe and path-based hierarchy are exercised too.
+#
+# Usage: python bench_crawler.py [categories] [articles_per_category] [latency_ms]
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from kb_crawler import crawl_hierarchy
+
+ROOT_PATH = 'portal/en/kb/demo'
+
+
+def write_fixture_kb(folder, categories, articles):
+    """Three category levels under the root; returns the expected {leaf link: (P1, P2, P3, leaf name)}."""
+    expected = {}
+    sidebar = ''.join(f'<li><a href="/{ROOT_PATH}/guide-{c}">Guide {c}</a></li>' for c in range(categories))
+
+    def write(path, title, body):
+        target = os.path.join(folder, path, 'index.html')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(f'<html><head><title>{title}</title></head><body><ul class="nav">{sidebar}</ul>'
+                    f'<a href="https://example.org/elsewhere">External</a>{body}</body></html>')
+
+    write(ROOT_PATH, 'Demo Help', '')
+    for c in range(categories):
+        p1 = f'{ROOT_PATH}/guide-{c}'
+        write(p1, f'Guide {c}', ''.join(f'<a href="/{p1}/section-{s}">Section {c}.{s}</a>' for s in range(2)))
+        for s in range(2):
+            p2 = f'{p1}/section-{s}'
+            write(p2, f'Section {c}.{s}', f'<a href="/{p2}/topic">Topic {c}.{s}</a>')
+            p3 = f'{p2}/topic'
+            links = []
+            for a in range(articles):
+                article = f'{p3}/articles/article-{a}'
+                write(article, f'Article {a}', f'<div>Body</div><a href="/{p3}#top">Back</a>')
+                links.append(f'<a href="/{article}">Article {c}.{s}.{a}</a>')
+                expected[f'/{article}'] = (f'Guide {c}', f'Section {c}.{s}', f'Topic {c}.{s}', f'Article {c}.{s}.{a}')
+            write(p3, f'Topic {c}.{s}', ''.join(links))
+    return expected
+
+
+class LatencyHandler(SimpleHTTPRequestHandler):
+    latency = 0.03
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def run(base_url, expected, workers):
+    start = time.perf_counter()
+    stats = {}
+    rows = list(crawl_hierarchy(f'{base_url}/{ROOT_PATH}', workers=workers, per_host=workers,
+                                min_interval=0, stats=stats))
+    elapsed = time.perf_counter() - start
+
+    mismatches = 0
+    for row in rows:
+        path = row['Leaf Link'][len(base_url):]
+        got = (row['P1 Name'], row['P2 Name'], row['P3 Name'], row['Leaf name'])
+        if expected.get(path) != got or row['Root Node'] != 'Demo Help':
+            mismatches += 1
+    missing = len(expected) - len({row['Leaf Link'] for row in rows})
+    print(f"workers={workers:<3} {stats['pages']:4d} pages  {len(rows):4d} leaves  "
+          f"{missing} missing  {mismatches} wrong  {elapsed:6.2f}s")
+    return elapsed
+
+
+if __name__ == '__main__':
+    categories = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    articles = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    LatencyHandler.latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 30) / 1000
+
+    with tempfile.TemporaryDirectory() as site:
+        expected = write_fixture_kb(site, categories, articles)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(LatencyHandler, directory=site))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        try:
+            sequential = run(base_url, expected, workers=1)
+            concurrent = run(base_url, expected, workers=8)
+            print(f"Concurrent discovery speed-up: {sequential / concurrent:.1f}x")
+        finally:
+            server.shutdown()
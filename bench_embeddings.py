@@ -0,0 +1,48 @@
+# Throughput comparison of the embedding backends on synthetic KB chunks.
+# The OpenAI backend is skipped when OPENAI_API_KEY is not set.
+#
+# Usage: python bench_embeddings.py [chunks] [backend ...]
+
+import os
+import sys
+import time
+
+import embedding_backends
+
+PARAGRAPH = ("To create a dashboard in Zoho Analytics, open the workspace, click Create and "
+             "choose Dashboard. Drag reports from the explorer onto the canvas and resize them. ")
+
+
+def build_chunks(count, words=180):
+    base = PARAGRAPH.split()
+    return [" ".join(f"{base[(i + j) % len(base)]}" for j in range(words)) + f" ({i})" for i in range(count)]
+
+
+def bench(name, chunks):
+    backend = embedding_backends.get_backend(name)
+    # Warm-up also loads the local model, so it is not counted as throughput
+    start = time.perf_counter()
+    backend.embed_batch(chunks[:2])
+    warmup = time.perf_counter() - start
+
+    batch_size = 32
+    start = time.perf_counter()
+    for i in range(0, len(chunks), batch_size):
+        if backend.embed_batch(chunks[i:i + batch_size]) is None:
+            print(f"{name:<8} failed")
+            return
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {backend.model:<45} {backend.dimensions:>5}-d  "
+          f"{len(chunks) / elapsed:8.1f} chunks/s  (warm-up {warmup:.1f}s)")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    names = sys.argv[2:] or list(embedding_backends.BACKENDS)
+    chunks = build_chunks(count)
+    print(f"{count} chunks, {os.cpu_count()} CPU cores")
+    for name in names:
+        if name == "openai" and not os.getenv("OPENAI_API_KEY"):
+            print("openai   skipped (OPENAI_API_KEY not set)")
+            continue
+        bench(name, chunks)
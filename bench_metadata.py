@@ -0,0 +1,103 @@
+# Size/time comparison of the inline and normalized metadata layouts written by ET.py.
+# Builds synthetic batches for both layouts, then reports the on-disk size of Chunks/,
+# the Pinecone upsert payload LOAD.py would send, and how long LOAD.py takes to build it.
+# Both layouts are written with the same JSON formatting (indent=4) so the comparison
+# measures the layout alone; the compact output ET.py uses for normalized batches is
+# measured separately against the indented normalized batches.
+#
+# Usage: python bench_metadata.py [leaves] [chunks_per_leaf] [dimensions]
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+
+from LOAD import load_vectors_from_folder
+
+BATCH_SIZE = 50
+
+
+def build_leaves(count):
+    leaves = []
+    for i in range(count):
+        base = f"https://help.zoho.com/portal/en/kb/analytics/guide-{i % 7}/section-{i % 31}"
+        leaves.append({
+            "root_name": "Zoho Analytics", "root_link": "https://help.zoho.com/portal/en/kb/analytics",
+            "p1_name": f"Guide {i % 7}", "p1_link": f"https://help.zoho.com/portal/en/kb/analytics/guide-{i % 7}",
+            "p2_name": f"Section {i % 31}", "p2_link": base,
+            "p3_name": f"Topic {i % 97}", "p3_link": f"{base}/topic-{i % 97}",
+            "p4_name": f"Subtopic {i}", "p4_link": f"{base}/topic-{i % 97}/sub-{i}",
+            "leaf_name": f"Article {i}", "leaf_link": f"{base}/articles/article-{i}",
+        })
+    return leaves
+
+
+def write_batches(folder, records, compact):
+    for start in range(0, len(records), BATCH_SIZE):
+        path = os.path.join(folder, f"embeddings_batch_{start // BATCH_SIZE + 1}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            if compact:
+                json.dump(records[start:start + BATCH_SIZE], f, ensure_ascii=False, separators=(',', ':'))
+            else:
+                json.dump(records[start:start + BATCH_SIZE], f, ensure_ascii=False, indent=4)
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+
+
+def measure(label, folder, nodes):
+    start = time.perf_counter()
+    vectors, _ = load_vectors_from_folder(folder, nodes=nodes)
+    elapsed = time.perf_counter() - start
+    payload = json.dumps({"namespace": "bench", "vectors": vectors}).encode("utf-8")
+    metadata_bytes = sum(len(json.dumps(v["metadata"]).encode("utf-8")) for v in vectors)
+    print(f"{label:<11} disk {folder_size(folder) / 1e6:8.2f} MB  payload {len(payload) / 1e6:8.2f} MB  "
+          f"metadata {metadata_bytes / 1e3:8.1f} KB  load {elapsed * 1000:8.1f} ms")
+    return len(payload)
+
+
+if __name__ == "__main__":
+    leaf_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    chunks_per_leaf = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    dimensions = int(sys.argv[3]) if len(sys.argv) > 3 else 1536
+
+    random.seed(0)
+    chunk_text = "Zoho Analytics lets you build reports and dashboards. " * 40
+    inline, normalized, nodes = [], [], {}
+    for leaf_index, metadata in enumerate(build_leaves(leaf_count)):
+        node_id = f"{leaf_index:012x}"
+        nodes[node_id] = metadata
+        prefix = (f"Root: {metadata['root_name']}\nP1: {metadata['p1_name']}\nP2: {metadata['p2_name']}\n"
+                  f"P3: {metadata['p3_name']}\nP4: {metadata['p4_name']}\nLeaf: {metadata['leaf_name']}\nChunk: ")
+        for chunk_index in range(chunks_per_leaf):
+            embedding = [random.uniform(-0.1, 0.1) for _ in range(dimensions)]
+            vector_id = f"{node_id}-{chunk_index}"
+            inline.append({"id": vector_id, "combined_chunk": prefix + chunk_text,
+                           "content_hash": "0" * 64, "embedding": embedding, "metadata": metadata})
+            normalized.append({"id": vector_id, "node_id": node_id, "chunk": chunk_text,
+                               "content_hash": "0" * 64, "embedding": embedding})
+
+    with tempfile.TemporaryDirectory() as inline_dir, tempfile.TemporaryDirectory() as normalized_dir, \
+            tempfile.TemporaryDirectory() as compact_dir:
+        write_batches(inline_dir, inline, compact=False)
+        write_batches(normalized_dir, normalized, compact=False)
+        write_batches(compact_dir, normalized, compact=True)
+        for folder in (normalized_dir, compact_dir):
+            with open(os.path.join(folder, "hierarchy_nodes.json"), "w", encoding="utf-8") as f:
+                json.dump(nodes, f, ensure_ascii=False, indent=4)
+
+        print(f"{leaf_count} leaves x {chunks_per_leaf} chunks, {dimensions}-d embeddings")
+        print("Layout (both indent=4):")
+        before = measure("inline", inline_dir, {})
+        after = measure("normalized", normalized_dir, nodes)
+        print(f"Upload payload reduced by {(1 - after / before) * 100:.1f}%, "
+              f"Chunks/ by {(1 - folder_size(normalized_dir) / folder_size(inline_dir)) * 100:.1f}%")
+        print("Formatting (normalized layout):")
+        measure("indent=4", normalized_dir, nodes)
+        measure("compact", compact_dir, nodes)
+        print(f"Compact output shrinks Chunks/ by "
+              f"{(1 - folder_size(compact_dir) / folder_size(normalized_dir)) * 100:.1f}% "
+              f"(the upload payload is unchanged)")
@@ -0,0 +1,51 @@
+# Parse-throughput benchmark: full page_source + BeautifulSoup (old ET.py path)
+# against container-only outer HTML + lxml markdown rendering (new default).
+#
+# Usage: python bench_parse.py [iterations]
+
+import sys
+import time
+
+from html_extract import CONTAINER_CLASS, html_to_markdown, extract_text_from_page_source
+
+
+def build_article(sections=12):
+    parts = []
+    for s in range(sections):
+        parts.append(f"<h2>Section {s}</h2>")
+        parts.append("<p>" + "Zoho Analytics lets you build reports and dashboards. " * 8 + "</p>")
+        parts.append("<ul>" + "".join(f"<li>Step {i} of the <b>setup</b> flow</li>" for i in range(6)) + "</ul>")
+        parts.append("<table><tr><th>Option</th><th>Description</th></tr>" +
+                     "".join(f"<tr><td>opt{i}</td><td>Does thing {i}</td></tr>" for i in range(5)) +
+                     "</table>")
+    return f'<div class="{CONTAINER_CLASS}">' + "".join(parts) + "</div>"
+
+
+def build_page(article):
+    # Rough stand-in for the KB page chrome around the article
+    nav = "".join(f'<li><a href="/kb/{i}">Category {i}</a></li>' for i in range(300))
+    scripts = "".join(f"<script>var analytics{i} = {{a: {i}}};</script>" for i in range(40))
+    styles = "<style>" + ".c{color:red}" * 2000 + "</style>"
+    return (f"<html><head>{styles}{scripts}</head><body><header><ul>{nav}</ul></header>"
+            f"<main>{article}</main><footer><ul>{nav}</ul></footer></body></html>")
+
+
+def bench(label, func, payload, iterations):
+    func(payload)  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(payload)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {iterations / elapsed:8.1f} pages/s  "
+          f"({elapsed / iterations * 1000:.2f} ms/page, input {len(payload) / 1024:.0f} KiB)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    article = build_article()
+    page = build_page(article)
+
+    old = bench("page_source + html.parser", extract_text_from_page_source, page, iterations)
+    new = bench("container + html_to_markdown", html_to_markdown, article, iterations)
+    print(f"Speed-up: {old / new:.1f}x")
@@ -0,0 +1,150 @@
+# Chrome set-up shared by the scrapers.
+#
+# The "lean" profile only loads what is needed to render the article text: images are
+# disabled, images/fonts/stylesheets/media and tracker domains are blocked through the
+# DevTools protocol, and the profile and disk cache live in persistent directories so
+# scripts are reused across pages and runs. BrowserSession restarts Chrome every
+# BROWSER_RECYCLE_PAGES pages to keep its memory from growing over a long crawl.
+# Each process claims its own numbered slot under BROWSER_PROFILE_DIR (chrome_profile/0,
+# chrome_profile/1, ...), so queue workers and data chunking.py running side by side
+# never point Chrome at the same --user-data-dir; later runs reuse the free slots.
+
+import os
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'lean')
+BROWSER_PROFILE_DIR = os.getenv('BROWSER_PROFILE_DIR', 'chrome_profile')
+BROWSER_RECYCLE_PAGES = int(os.getenv('BROWSER_RECYCLE_PAGES', '200'))
+
+BLOCKED_RESOURCE_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css',
+    '*.mp4', '*.webm', '*.mp3', '*.ogg', '*.m3u8',
+]
+
+BLOCKED_TRACKER_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*connect.facebook.com*', '*hotjar.com*', '*clarity.ms*',
+    '*segment.io*', '*newrelic.com*', '*nr-data.net*', '*linkedin.com/px*',
+]
+
+
+# base dir -> (slot dir, open lock file); the lock is held for the life of the process
+_claimed_slots = {}
+
+
+def claim_profile_dir(base_dir=BROWSER_PROFILE_DIR):
+    """Return a slot directory under base_dir that no other running process is using."""
+    base_dir = os.path.abspath(base_dir)
+    if base_dir in _claimed_slots:
+        return _claimed_slots[base_dir][0]
+    os.makedirs(base_dir, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): fall back to one profile per process
+        slot_dir = os.path.join(base_dir, str(os.getpid()))
+        _claimed_slots[base_dir] = (slot_dir, None)
+        return slot_dir
+
+    slot = 0
+    while True:
+        lock_file = open(os.path.join(base_dir, f"{slot}.lock"), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            slot += 1
+            continue
+        slot_dir = os.path.join(base_dir, str(slot))
+        _claimed_slots[base_dir] = (slot_dir, lock_file)
+        return slot_dir
+
+
+def build_chrome_options(profile=BROWSER_PROFILE, profile_dir=BROWSER_PROFILE_DIR):
+    chrome_options = Options()
+    chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=1920,1080')
+    if profile != 'lean':
+        chrome_options.add_argument('--remote-debugging-port=9222')
+        return chrome_options
+
+    profile_dir = claim_profile_dir(profile_dir)
+    os.makedirs(profile_dir, exist_ok=True)
+    chrome_options.add_argument(f'--user-data-dir={profile_dir}')
+    chrome_options.add_argument(f"--disk-cache-dir={os.path.join(profile_dir, 'cache')}")
+    chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+    chrome_options.add_argument('--mute-audio')
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disable-background-networking')
+    chrome_options.add_argument('--disable-component-update')
+    chrome_options.add_argument('--disable-sync')
+    chrome_options.add_argument('--no-first-run')
+    chrome_options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.default_content_setting_values.notifications': 2,
+    })
+    return chrome_options
+
+
+def apply_resource_blocking(driver):
+    """Block heavy resource types and tracker domains through the DevTools protocol."""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs',
+                           {'urls': BLOCKED_RESOURCE_PATTERNS + BLOCKED_TRACKER_PATTERNS})
+
+
+def browser_rss(driver):
+    """Resident memory in bytes of chromedriver and every Chrome process under it."""
+    import psutil
+    process = psutil.Process(driver.service.process.pid)
+    total = 0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+class BrowserSession:
+    """Lazily started Chrome that is recycled after a fixed number of pages."""
+
+    def __init__(self, profile=BROWSER_PROFILE, profile_dir=BROWSER_PROFILE_DIR,
+                 recycle_pages=BROWSER_RECYCLE_PAGES, page_load_strategy=None, page_load_timeout=None):
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.recycle_pages = recycle_pages
+        self.page_load_strategy = page_load_strategy
+        self.page_load_timeout = page_load_timeout
+        self.pages = 0
+        self._driver = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            chrome_options = build_chrome_options(self.profile, self.profile_dir)
+            if self.page_load_strategy:
+                chrome_options.page_load_strategy = self.page_load_strategy
+            self._driver = webdriver.Chrome(options=chrome_options)
+            if self.page_load_timeout:
+                self._driver.set_page_load_timeout(self.page_load_timeout)
+            if self.profile == 'lean':
+                apply_resource_blocking(self._driver)
+        return self._driver
+
+    def page_done(self):
+        self.pages += 1
+        if self.recycle_pages and self.pages % self.recycle_pages == 0:
+            print(f"Recycling browser after {self.pages} pages")
+            self.quit()
+
+    def quit(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
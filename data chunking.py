@@ -3,10 +3,9 @@
 
 import csv
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
 import json
+from browser_profile import BrowserSession
 
 # Function to read and print Leaf name and Leaf Link from a CSV file
 def print_leaf_data_from_csv(file_path):
@@ -31,19 +30,14 @@ def print_leaf_data_from_csv(file_path):
         print(f"Error reading CSV file: {e}")
         return []
 
-# Set up headless browser options
-chrome_options = Options()
-chrome_options.add_argument('--headless')        # Run Chrome in headless mode
-chrome_options.add_argument('--no-sandbox')      # Bypass OS security model
-chrome_options.add_argument('--disable-dev-shm-usage')  # Overcome limited resource problems
-
-# Initialize the browser
-driver = webdriver.Chrome(options=chrome_options)
+# Initialize the browser (lean headless profile, see browser_profile.py)
+browser = BrowserSession()
 
 # Function to scrape text from a given URL
 def scrape_text(url):
     try:
         # Navigate to the URL
+        driver = browser.driver
         driver.get(url)
         # Wait for the page to load
         time.sleep(5)  # Adjust the sleep time if necessary
@@ -64,6 +58,8 @@ def scrape_text(url):
     except Exception as e:
         print(f"An error occurred while scraping {url}: {e}")
         return ""
+    finally:
+        browser.page_done()
 
 # Function to chunk the text into smaller pieces
 def chunk_text(text, chunk_size=500):
@@ -123,4 +119,4 @@ file_path = 'Zoho KB - Creator.csv'  # Replace with your actual file path
 scrape_and_chunk(file_path)
 
 # Close the browser after all scraping
-driver.quit()
+browser.quit()
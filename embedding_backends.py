@@ -0,0 +1,115 @@
+# Embedding backends used by ET.py, selected per run with EMBEDDING_BACKEND.
+#
+#   openai  - text-embedding-ada-002 over the API (default, 1536 dimensions)
+#   local   - sentence-transformers model on the CPU, batched across all cores;
+#             LOCAL_EMBEDDING_MODEL picks the model, LOCAL_EMBEDDING_RUNTIME=onnx
+#             runs it through ONNX Runtime instead of torch
+#
+# Every backend embeds a list of texts at once and reports its model name,
+# vector dimensions and the largest chunk (in tokens) it can embed without truncation.
+# A backend makes a single attempt per batch; callers own retries and backoff
+# (ET.py wraps embed_batch in retry_policy.retry).
+
+import os
+
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'openai')
+LOCAL_EMBEDDING_MODEL = os.getenv('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+LOCAL_EMBEDDING_RUNTIME = os.getenv('LOCAL_EMBEDDING_RUNTIME', 'torch')
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv('LOCAL_EMBEDDING_BATCH_SIZE', '32'))
+
+
+class EmbeddingBackend:
+    name = None
+    model = None
+    dimensions = None
+    max_chunk_tokens = None
+
+    def embed_batch(self, texts):
+        """Return one vector per text, or None if the batch failed."""
+        raise NotImplementedError
+
+    def embed(self, text):
+        vectors = self.embed_batch([text])
+        return vectors[0] if vectors else None
+
+    def info(self):
+        return {"backend": self.name, "model": self.model, "dimensions": self.dimensions}
+
+
+class OpenAIBackend(EmbeddingBackend):
+    name = 'openai'
+    model = 'text-embedding-ada-002'
+    dimensions = 1536
+    max_chunk_tokens = 7000
+
+    def embed_batch(self, texts):
+        import openai
+        try:
+            response = openai.Embedding.create(input=texts, model=self.model)
+            data = sorted(response["data"], key=lambda item: item["index"])
+            return [item["embedding"] for item in data]
+        except openai.error.RateLimitError:
+            print("Rate limit reached")
+            return None
+        except Exception as e:
+            print(f"Error generating embedding: {e}")
+            return None
+
+
+class LocalBackend(EmbeddingBackend):
+    name = 'local'
+
+    def __init__(self, model=LOCAL_EMBEDDING_MODEL, runtime=LOCAL_EMBEDDING_RUNTIME,
+                 batch_size=LOCAL_EMBEDDING_BATCH_SIZE):
+        self.model = model
+        self.runtime = runtime
+        self.batch_size = batch_size
+        self._model = None
+        self._dimensions = None
+        self._max_chunk_tokens = None
+
+    def _load(self):
+        # The model is loaded on first use so choosing the backend stays cheap
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            if self.runtime == 'onnx':
+                self._model = SentenceTransformer(self.model, device='cpu', backend='onnx')
+            else:
+                import torch
+                torch.set_num_threads(os.cpu_count() or 1)
+                self._model = SentenceTransformer(self.model, device='cpu')
+            self._dimensions = self._model.get_sentence_embedding_dimension()
+            # Word pieces and cl100k tokens are roughly comparable; keep a margin
+            self._max_chunk_tokens = int(self._model.max_seq_length * 0.8)
+        return self._model
+
+    @property
+    def dimensions(self):
+        self._load()
+        return self._dimensions
+
+    @property
+    def max_chunk_tokens(self):
+        self._load()
+        return self._max_chunk_tokens
+
+    def embed_batch(self, texts):
+        try:
+            vectors = self._load().encode(texts, batch_size=self.batch_size,
+                                          normalize_embeddings=True, show_progress_bar=False)
+            return [vector.tolist() for vector in vectors]
+        except Exception as e:
+            print(f"Error generating local embedding: {e}")
+            return None
+
+
+BACKENDS = {
+    'openai': OpenAIBackend,
+    'local': LocalBackend,
+}
+
+
+def get_backend(name=EMBEDDING_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
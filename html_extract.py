@@ -0,0 +1,169 @@
+# Converts the KB article container HTML into lightweight markdown so that
+# headings, lists and tables survive into the chunking step.
+
+import re
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional, fall back to BeautifulSoup plain text
+    lxml = None
+
+CONTAINER_CLASS = 'ArticleDetailLeftContainer__box'
+
+SKIP_TAGS = {'script', 'style', 'noscript', 'svg', 'button', 'form', 'iframe'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+LIST_TAGS = {'ul', 'ol'}
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'header', 'footer', 'main', 'aside',
+    'blockquote', 'pre', 'table', 'figure', 'figcaption', 'dl', 'dt', 'dd',
+    'hr', 'br', 'li'
+} | HEADING_TAGS | LIST_TAGS
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _collapse(text):
+    return _WHITESPACE.sub(' ', text or '').strip()
+
+
+def _tag(el):
+    # Comments and processing instructions have a callable as their tag
+    return el.tag.lower() if isinstance(el.tag, str) else ''
+
+
+def _is_block(el):
+    # Skipped elements (icons, buttons) are dropped but never split the surrounding sentence
+    tag = _tag(el)
+    if tag in SKIP_TAGS:
+        return False
+    if tag in BLOCK_TAGS:
+        return True
+    return any(_is_block(child) for child in el)
+
+
+def _inline_text(el):
+    """text_content() without the text of skipped descendants (e.g. an svg <title>)."""
+    parts = [el.text or '']
+    for child in el:
+        if _tag(child) not in SKIP_TAGS and _tag(child):
+            parts.append(_inline_text(child))
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+
+def _emit(lines, text):
+    if text:
+        lines.append(text)
+
+
+def _render_list(el, lines, depth):
+    ordered = _tag(el) == 'ol'
+    number = 0
+    for li in el:
+        if _tag(li) != 'li':
+            continue
+        number += 1
+        marker = f"{number}." if ordered else '-'
+        parts = [li.text or '']
+        nested = []
+        for child in li:
+            if _tag(child) in LIST_TAGS:
+                nested.append(child)
+            elif _tag(child) not in SKIP_TAGS:
+                parts.append(_inline_text(child))
+            parts.append(child.tail or '')
+        item_text = _collapse(' '.join(parts))
+        if item_text:
+            lines.append(f"{'  ' * depth}{marker} {item_text}")
+        for child in nested:
+            _render_list(child, lines, depth + 1)
+
+
+def _render_table(el, lines):
+    rows = []
+    for tr in el.iter('tr'):
+        cells = [_collapse(cell.text_content()).replace('|', '\\|')
+                 for cell in tr if _tag(cell) in ('td', 'th')]
+        if any(cells):
+            rows.append(cells)
+    if not rows:
+        return
+    width = max(len(row) for row in rows)
+    lines.append('')
+    for i, row in enumerate(rows):
+        row = row + [''] * (width - len(row))
+        lines.append('| ' + ' | '.join(row) + ' |')
+        if i == 0:
+            lines.append('|' + ' --- |' * width)
+    lines.append('')
+
+
+def _render(el, lines, depth=0):
+    tag = _tag(el)
+    if tag in SKIP_TAGS:
+        return
+    if tag in HEADING_TAGS:
+        text = _collapse(el.text_content())
+        if text:
+            lines.append('')
+            lines.append(f"{'#' * int(tag[1])} {text}")
+        return
+    if tag in LIST_TAGS:
+        _render_list(el, lines, depth)
+        return
+    if tag == 'table':
+        _render_table(el, lines)
+        return
+    if tag == 'pre':
+        code = el.text_content().strip('\n')
+        if code.strip():
+            lines.extend(['```', code, '```'])
+        return
+
+    # Gather inline runs between block-level children
+    buffer = [el.text or '']
+    for child in el:
+        if _is_block(child):
+            _emit(lines, _collapse(' '.join(buffer)))
+            _render(child, lines, depth)
+            buffer = [child.tail or '']
+        else:
+            if _tag(child) not in SKIP_TAGS and _tag(child):
+                buffer.append(_inline_text(child))
+            buffer.append(child.tail or '')
+    _emit(lines, _collapse(' '.join(buffer)))
+
+
+def html_to_markdown(html):
+    """
+    Render an HTML fragment (normally the article container's outer HTML)
+    as markdown-ish text: '#' headings, '-'/'1.' list items and pipe tables.
+    Falls back to BeautifulSoup plain text when lxml is not installed.
+    """
+    if not html or not html.strip():
+        return ""
+    if lxml is None:
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(html, 'html.parser').get_text(separator='\n', strip=True)
+
+    root = lxml.html.fragment_fromstring(html, create_parent='div')
+    lines = []
+    _render(root, lines)
+
+    # Drop leading/trailing blank lines and squeeze repeated blank lines
+    output = []
+    for line in lines:
+        if not line and (not output or not output[-1]):
+            continue
+        output.append(line)
+    return '\n'.join(output).strip()
+
+
+def extract_text_from_page_source(html):
+    """Legacy path: parse the whole page and pull plain text out of the container div."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    main_content = soup.find('div', {'class': CONTAINER_CLASS})
+    if main_content:
+        return main_content.get_text(separator='\n', strip=True)
+    return ""
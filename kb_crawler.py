@@ -0,0 +1,319 @@
+# Crawls a KB from its Root Link and produces the Root -> P1..P4 -> Leaf rows that
+# KB.csv used to be assembled by hand for.
+#
+# Category and article pages are fetched concurrently with a per-host concurrency
+# limit and minimum spacing between requests; every URL is visited once. Links under
+# the root path are articles when they contain ARTICLE_MARKER, otherwise categories.
+# The hierarchy comes from the URL path (root/p1/p2/.../articles/leaf), so the result
+# does not depend on which page happened to link to a category first; names are the
+# anchor texts the links were found with.
+#
+# LeafStream runs the crawl in a background thread and yields rows as they are found,
+# so ET.py can scrape articles while discovery continues.
+#
+# Pages are fetched with plain requests by default. CRAWL_FETCH=browser renders them in
+# headless Chrome instead (BrowserFetcher), for KBs that build their navigation client-side.
+#
+# Usage: python kb_crawler.py <root link> [output.csv]
+
+import os
+import re
+import csv
+import sys
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urljoin, urldefrag, urlparse, urlunparse
+
+import requests
+
+LEAF_COLUMNS = ['Root Node', 'Root Link', 'P1 Name', 'P1 Link',
+                'P2 Name', 'P2 Link', 'P3 Name', 'P3 Link',
+                'P4 Name', 'P4 Link', 'Leaf name', 'Leaf Link']
+
+ARTICLE_MARKER = os.getenv('CRAWL_ARTICLE_MARKER', 'articles')
+CRAWL_WORKERS = int(os.getenv('CRAWL_WORKERS', '8'))
+CRAWL_PER_HOST = int(os.getenv('CRAWL_PER_HOST', '2'))
+CRAWL_MIN_INTERVAL = float(os.getenv('CRAWL_MIN_INTERVAL', '0.5'))
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', '6'))
+CRAWL_FETCH = os.getenv('CRAWL_FETCH', 'requests')
+CRAWL_RENDER_TIMEOUT = float(os.getenv('CRAWL_RENDER_TIMEOUT', '20'))
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_url(url):
+    url, _ = urldefrag(url)
+    parts = urlparse(url)
+    path = parts.path.rstrip('/') or '/'
+    return urlunparse((parts.scheme.lower(), parts.netloc.lower(), path, '', parts.query, ''))
+
+
+def humanize_slug(slug):
+    return slug.replace('-', ' ').replace('_', ' ').strip().title()
+
+
+def fetch_html(url, timeout=20):
+    response = requests.get(url, timeout=timeout, headers={'User-Agent': 'KB-hierarchy-crawler'})
+    response.raise_for_status()
+    return response.text
+
+
+class BrowserFetcher:
+    """
+    fetch= for crawl_hierarchy that returns the rendered DOM from headless Chrome.
+    Up to size browsers are started on demand, each with its own profile directory,
+    and every fetch borrows one; a page counts as rendered once its links stop
+    changing. close() quits them all.
+    """
+
+    def __init__(self, size=CRAWL_PER_HOST, timeout=CRAWL_RENDER_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _borrow(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._sessions) < self.size:
+                import browser_profile
+                profile_dir = os.path.join(browser_profile.BROWSER_PROFILE_DIR, f'crawl{len(self._sessions)}')
+                session = browser_profile.BrowserSession(profile_dir=profile_dir, page_load_strategy='eager',
+                                                         page_load_timeout=self.timeout)
+                self._sessions.append(session)
+                return session
+        return self._idle.get()
+
+    def _wait_for_links(self, driver):
+        deadline = time.monotonic() + self.timeout
+        previous = -1
+        while time.monotonic() < deadline:
+            count = driver.execute_script("return document.querySelectorAll('a[href]').length")
+            if count and count == previous:
+                return
+            previous = count
+            time.sleep(0.5)
+
+    def __call__(self, url):
+        session = self._borrow()
+        try:
+            driver = session.driver
+            driver.get(url)
+            self._wait_for_links(driver)
+            html = driver.page_source
+            session.page_done()
+            return html
+        except Exception:
+            session.quit()  # the next page gets a fresh browser; crawl_hierarchy counts the error
+            raise
+        finally:
+            self._idle.put(session)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.quit()
+
+
+def make_fetch(mode=CRAWL_FETCH):
+    if mode == 'browser':
+        return BrowserFetcher()
+    if mode != 'requests':
+        raise ValueError(f"Unknown CRAWL_FETCH '{mode}', expected 'requests' or 'browser'")
+    return fetch_html
+
+
+def parse_page(html, base_url):
+    """Return (page title, [(anchor text, absolute normalized link), ...])."""
+    import lxml.html
+    doc = lxml.html.fromstring(html)
+    title = _WHITESPACE.sub(' ', doc.findtext('.//title') or '').strip()
+    links = []
+    for anchor in doc.xpath('//a[@href]'):
+        href = anchor.get('href').strip()
+        if not href or href.startswith(('javascript:', 'mailto:', 'tel:')):
+            continue
+        name = _WHITESPACE.sub(' ', anchor.text_content()).strip()
+        links.append((name, normalize_url(urljoin(base_url, href))))
+    return title, links
+
+
+class HostLimiter:
+    """At most per_host concurrent requests per host, started at least min_interval apart."""
+
+    def __init__(self, per_host=CRAWL_PER_HOST, min_interval=CRAWL_MIN_INTERVAL):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(self.per_host))
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def crawl_hierarchy(root_link, root_name=None, fetch=fetch_html, workers=CRAWL_WORKERS,
+                    per_host=CRAWL_PER_HOST, min_interval=CRAWL_MIN_INTERVAL,
+                    max_depth=CRAWL_MAX_DEPTH, stats=None):
+    """
+    Generator of 12-column leaf rows, yielded as soon as each article link is found.
+    stats (optional dict) is updated with 'pages', 'leaves' and 'errors'.
+    """
+    stats = stats if stats is not None else {}
+    stats.update({'pages': 0, 'leaves': 0, 'errors': 0})
+    root_link = normalize_url(root_link)
+    root_parts = urlparse(root_link)
+    root_segments = [segment for segment in root_parts.path.split('/') if segment]
+    limiter = HostLimiter(per_host, min_interval)
+    names = {}  # category link -> anchor text it was first seen with
+    seen = {root_link}
+
+    def relative_segments(link):
+        parts = urlparse(link)
+        segments = [segment for segment in parts.path.split('/') if segment]
+        if parts.netloc != root_parts.netloc or segments[:len(root_segments)] != root_segments:
+            return None
+        return segments[len(root_segments):]
+
+    def category_link(segments):
+        path = '/'.join(root_segments + segments)
+        return urlunparse((root_parts.scheme, root_parts.netloc, '/' + path, '', '', ''))
+
+    def leaf_row(name, link, category_segments):
+        row = dict.fromkeys(LEAF_COLUMNS, '')
+        row['Root Node'] = root_name
+        row['Root Link'] = root_link
+        for level in range(min(4, len(category_segments))):
+            p_link = category_link(category_segments[:level + 1])
+            row[f'P{level + 1} Name'] = names.get(p_link) or humanize_slug(category_segments[level])
+            row[f'P{level + 1} Link'] = p_link
+        row['Leaf name'] = name or humanize_slug(category_segments[-1] if category_segments else link)
+        row['Leaf Link'] = link
+        return row
+
+    def visit(url):
+        with limiter.slot(url):
+            html = fetch(url)
+        return parse_page(html, url)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(visit, root_link): root_link}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_url = pending.pop(future)
+                try:
+                    title, links = future.result()
+                except Exception as e:
+                    stats['errors'] += 1
+                    print(f"Error crawling {page_url}: {e}")
+                    continue
+                stats['pages'] += 1
+                if page_url == root_link and not root_name:
+                    root_name = title or humanize_slug(root_segments[-1] if root_segments else root_parts.netloc)
+
+                for name, link in links:
+                    segments = relative_segments(link)
+                    if not segments or link in seen:
+                        continue
+                    seen.add(link)
+                    if ARTICLE_MARKER in segments[:-1]:
+                        marker = segments.index(ARTICLE_MARKER)
+                        stats['leaves'] += 1
+                        yield leaf_row(name, link, segments[:marker])
+                    elif len(segments) <= max_depth:
+                        if not urlparse(link).query:  # pagination links are not category names
+                            names.setdefault(category_link(segments), name)
+                        pending[pool.submit(visit, link)] = link
+
+
+class LeafStream:
+    """
+    Iterable of leaf rows produced by a crawl running in a background thread.
+    Rows are optionally appended to output_csv as they arrive. 'complete' is only
+    True once the crawl has finished without fetch errors, so callers know whether
+    a missing leaf really disappeared from the KB.
+    """
+    _DONE = object()
+
+    def __init__(self, root_link, output_csv=None, **crawl_options):
+        self.root_link = root_link
+        self.output_csv = output_csv
+        self.crawl_options = crawl_options
+        self.stats = {'pages': 0, 'leaves': 0, 'errors': 0}
+        self._rows = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        output = None
+        try:
+            writer = None
+            if self.output_csv:
+                output = open(self.output_csv, 'w', newline='', encoding='utf-8')
+                writer = csv.DictWriter(output, fieldnames=LEAF_COLUMNS)
+                writer.writeheader()
+            for row in crawl_hierarchy(self.root_link, stats=self.stats, **self.crawl_options):
+                if writer:
+                    writer.writerow(row)
+                    output.flush()
+                self._rows.put(row)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Crawl of {self.root_link} failed: {e}")
+        finally:
+            if output:
+                output.close()
+            # Browsers started for the crawl are not needed once discovery is over
+            close_fetch = getattr(self.crawl_options.get('fetch'), 'close', None)
+            if close_fetch:
+                close_fetch()
+            self._rows.put(self._DONE)
+
+    def __iter__(self):
+        while True:
+            row = self._rows.get()
+            if row is self._DONE:
+                # _run may still be closing up; wait so 'complete' is final once iteration ends
+                self._thread.join()
+                return
+            yield row
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def complete(self):
+        return not self._thread.is_alive() and self.stats['errors'] == 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python kb_crawler.py <root link> [output.csv]")
+        sys.exit(1)
+    output_csv = sys.argv[2] if len(sys.argv) > 2 else 'KB.csv'
+    start = time.perf_counter()
+    stream = LeafStream(sys.argv[1], output_csv=output_csv, fetch=make_fetch())
+    for row in stream:
+        print(f"{row['P1 Name']} / {row['P2 Name']} / {row['Leaf name']}")
+    print(f"Crawled {stream.stats['pages']} pages, found {stream.stats['leaves']} leaves "
+          f"({stream.stats['errors']} errors) in {time.perf_counter() - start:.1f}s -> {output_csv}")
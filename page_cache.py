@@ -0,0 +1,181 @@
+# Content-addressed, gzip-compressed cache of extracted KB article text keyed by Leaf Link.
+#
+# Layout:
+#   page_cache/entries/12/1234...json  one file per leaf link (named by the link's sha1):
+#                                      {url, sha256, etag, last_modified, fetched_at, extraction_mode}
+#   page_cache/objects/ab/abcdef...gz  compressed article text, named by its sha256
+#
+# Entries are written atomically one link at a time, so queue workers sharing the cache
+# never overwrite each other's entries. A page_cache/index.json from older versions is
+# split into entry files on first use.
+#
+# PAGE_CACHE_MODE controls how entries are used:
+#   off          - never read or write the cache
+#   ttl          - reuse entries younger than PAGE_CACHE_TTL seconds, otherwise scrape again
+#   revalidate   - every entry is revalidated with a conditional GET (ETag/Last-Modified) on
+#                  each run and only reused on 304 Not Modified, so KB edits show up on the
+#                  next run; entries whose page sent no validators fall back to PAGE_CACHE_TTL.
+#                  Validators are taken from that GET, so storing a page costs no extra request
+#   cache-only   - only serve from cache, never touch the network (misses are reported, not scraped)
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import requests
+
+CACHE_FOLDER = os.getenv('PAGE_CACHE_DIR', 'page_cache')
+LEGACY_INDEX = os.path.join(CACHE_FOLDER, 'index.json')
+CACHE_MODE = os.getenv('PAGE_CACHE_MODE', 'revalidate')
+CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', str(7 * 24 * 3600)))
+CACHE_MODES = ('off', 'ttl', 'revalidate', 'cache-only')
+
+if CACHE_MODE not in CACHE_MODES:
+    print(f"Warning: unknown PAGE_CACHE_MODE '{CACHE_MODE}', using 'revalidate'")
+    CACHE_MODE = 'revalidate'
+
+
+def _object_path(digest):
+    return os.path.join(CACHE_FOLDER, 'objects', digest[:2], f"{digest}.gz")
+
+
+def _entry_path(url):
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_FOLDER, 'entries', digest[:2], f"{digest}.json")
+
+
+def load_entry(url):
+    path = _entry_path(url)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading page cache entry for {url}: {e}")
+        return None
+
+
+def save_entry(url, entry):
+    path = _entry_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique temp name: two workers may store the same link at once
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(entry, url=url), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def migrate_legacy_index():
+    """Split an old single-file index.json into per-link entries (existing entries win)."""
+    if CACHE_MODE == 'off' or not os.path.exists(LEGACY_INDEX):
+        return
+    try:
+        with open(LEGACY_INDEX, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        for url, entry in index.items():
+            if not os.path.exists(_entry_path(url)):
+                save_entry(url, entry)
+        os.replace(LEGACY_INDEX, LEGACY_INDEX + '.migrated')
+        print(f"Migrated {len(index)} page cache entries from {LEGACY_INDEX}")
+    except FileNotFoundError:
+        pass  # another worker migrated it first
+    except Exception as e:
+        print(f"Error migrating page cache index: {e}")
+
+
+# Validators from a revalidation GET that came back 200, stored with the re-scraped page
+_fresh_validators = {}
+
+
+def has_validators(entry):
+    return bool(entry.get('etag') or entry.get('last_modified'))
+
+
+def revalidate(entry, url, timeout=15):
+    """
+    Conditional GET; True when the server answers 304 Not Modified. Without validators
+    it is a plain GET, only used to pick up validators for the next store.
+    """
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    try:
+        response = requests.get(url, headers=headers, allow_redirects=True, timeout=timeout)
+        if response.status_code == 304:
+            return True
+        if response.ok:
+            _fresh_validators[url] = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return False
+    except Exception as e:
+        print(f"Revalidation failed for {url}: {e}")
+        return False
+
+
+def read_object(digest):
+    path = _object_path(digest)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+def write_object(text):
+    data = text.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    path = _object_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return digest
+
+
+def get_cached_text(url, extraction_mode):
+    """
+    Return the cached text for url if the current mode allows using it, else None.
+    Entries written by a different extraction mode are treated as misses.
+    """
+    if CACHE_MODE == 'off':
+        return None
+    entry = load_entry(url)
+    if not entry or entry.get('extraction_mode') != extraction_mode:
+        return None
+    text = read_object(entry['sha256'])
+    if text is None:
+        return None
+    if CACHE_MODE == 'cache-only':
+        return text
+
+    fresh = time.time() - entry.get('fetched_at', 0) < CACHE_TTL
+    if CACHE_MODE == 'ttl':
+        return text if fresh else None
+    # Pages that sent no ETag/Last-Modified cannot be revalidated, so they use the TTL
+    if not has_validators(entry) and fresh:
+        return text
+    if revalidate(entry, url):
+        entry['fetched_at'] = time.time()
+        save_entry(url, entry)
+        return text
+    return None
+
+
+def store_text(url, text, extraction_mode):
+    if CACHE_MODE == 'off' or not text:
+        return
+    etag, last_modified = _fresh_validators.pop(url, (None, None))
+    try:
+        save_entry(url, {
+            'sha256': write_object(text),
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+            'extraction_mode': extraction_mode
+        })
+    except Exception as e:
+        print(f"Error writing page cache for {url}: {e}")
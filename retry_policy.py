@@ -0,0 +1,72 @@
+# Shared retry/backoff policy and per-host timeout learning for the scrapers.
+#
+# Every retry loop goes through retry(), which sleeps with full-jitter exponential
+# backoff and gives up after a fixed number of attempts, so one dead link can never
+# stall a crawl. HostTimeouts replaces fixed page-load waits with a per-host timeout
+# estimated from observed load times (the same smoothing TCP uses for its RTO).
+
+import os
+import time
+import random
+from urllib.parse import urlparse
+
+MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '2'))
+MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '60'))
+
+
+def backoff_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Full jitter: uniform between 0 and min(max_delay, base_delay * 2**attempt)."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry(func, should_retry=lambda result: result is None, attempts=MAX_ATTEMPTS,
+          base_delay=BASE_DELAY, max_delay=MAX_DELAY, description="operation"):
+    """
+    Call func() until should_retry(result) is False or attempts run out,
+    sleeping with jittered exponential backoff in between. Returns the last result.
+    """
+    result = None
+    for attempt in range(attempts):
+        result = func()
+        if not should_retry(result):
+            return result
+        if attempt < attempts - 1:
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"Retrying {description} in {delay:.1f}s (attempt {attempt + 2} of {attempts})")
+            time.sleep(delay)
+    print(f"Giving up on {description} after {attempts} attempts")
+    return result
+
+
+class HostTimeouts:
+    """Learned per-host wait timeouts: smoothed load time plus four deviations, clamped."""
+
+    def __init__(self, initial=30.0, minimum=5.0, maximum=60.0, alpha=0.125, beta=0.25):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.alpha = alpha
+        self.beta = beta
+        self.hosts = {}  # host -> [smoothed load time, load time deviation, current timeout]
+
+    def timeout(self, url):
+        host = urlparse(url).netloc
+        return self.hosts[host][2] if host in self.hosts else self.initial
+
+    def observe(self, url, seconds):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            srtt, rttvar = seconds, seconds / 2
+        else:
+            srtt, rttvar, _ = self.hosts[host]
+            rttvar = (1 - self.beta) * rttvar + self.beta * abs(srtt - seconds)
+            srtt = (1 - self.alpha) * srtt + self.alpha * seconds
+        timeout = min(self.maximum, max(self.minimum, srtt + 4 * rttvar))
+        self.hosts[host] = [srtt, rttvar, timeout]
+
+    def observe_timeout(self, url):
+        """A wait ran out: double the host's timeout until it reaches the maximum."""
+        host = urlparse(url).netloc
+        srtt, rttvar, timeout = self.hosts.get(host, [self.initial, self.initial / 2, self.initial])
+        self.hosts[host] = [srtt, rttvar, min(self.maximum, timeout * 2)]
@@ -0,0 +1,428 @@
+# Lease-based work queue for splitting one KB crawl across processes or machines.
+#
+# Backed by a single SQLite file (WORK_QUEUE_DB) that every worker opens; for
+# several machines put it on a shared file system with working POSIX locks.
+# Each leaf row moves pending -> leased -> done, or back to pending on failure
+# until MAX_ATTEMPTS is reached, after which it is dead-lettered with its last error.
+# A failed leaf is not leased again before its backoff delay (retry_policy) has passed.
+# Incremental runs re-read every leaf in passes: the first worker to start on a finished
+# queue (nothing pending or leased) begins a new pass, and enqueueing a leaf for that pass
+# moves it back to pending. Leaves not listed again are left on the old pass number, so
+# once the listing is complete they can be told apart as removed from the KB.
+# Roles are named leases held by one worker at a time (e.g. "crawler" for the worker
+# that discovers leaves with kb_crawler.py while the others only lease them).
+#
+# Usage:
+#   python work_queue.py enqueue KB.csv               add leaves (existing rows are kept)
+#   python work_queue.py import-errors scraping_errors.csv
+#   python work_queue.py requeue-dead                 give dead leaves a fresh set of attempts
+#   python work_queue.py reset                        move every done leaf back to pending
+#   python work_queue.py stats
+
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from retry_policy import backoff_delay
+
+WORK_QUEUE_DB = os.getenv('WORK_QUEUE_DB', 'work_queue.db')
+LEASE_SECONDS = int(os.getenv('WORK_QUEUE_LEASE', '300'))
+MAX_ATTEMPTS = int(os.getenv('WORK_QUEUE_MAX_ATTEMPTS', '5'))
+RETRY_BASE_DELAY = float(os.getenv('WORK_QUEUE_RETRY_BASE_DELAY', '15'))
+RETRY_MAX_DELAY = float(os.getenv('WORK_QUEUE_RETRY_MAX_DELAY', '600'))
+
+LEAF_COLUMNS = ['Root Node', 'Root Link', 'P1 Name', 'P1 Link',
+                'P2 Name', 'P2 Link', 'P3 Name', 'P3 Link',
+                'P4 Name', 'P4 Link', 'Leaf name', 'Leaf Link']
+
+
+def make_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def connect(db_path=WORK_QUEUE_DB):
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 60000")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS leaves (
+            leaf_link     TEXT PRIMARY KEY,
+            payload       TEXT NOT NULL,
+            status        TEXT NOT NULL DEFAULT 'pending',
+            attempts      INTEGER NOT NULL DEFAULT 0,
+            lease_owner   TEXT,
+            lease_expires REAL,
+            last_error    TEXT,
+            updated_at    REAL
+        )
+    """)
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(leaves)")]
+    if 'pass_number' not in columns:  # queues created before incremental passes
+        conn.execute("ALTER TABLE leaves ADD COLUMN pass_number INTEGER NOT NULL DEFAULT 0")
+    if 'not_before' not in columns:  # queues created before retry backoff
+        conn.execute("ALTER TABLE leaves ADD COLUMN not_before REAL NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS leaves_status ON leaves (status, lease_expires)")
+    conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS roles (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+    return conn
+
+
+@contextmanager
+def exclusive(conn):
+    """Hold the database write lock; used to serialise shared-file updates across workers."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def enqueue_leaves(conn, leaf_data, pass_number=None):
+    """
+    Add leaves that are not queued yet; returns how many were new. With pass_number
+    (incremental passes) leaves from an earlier pass are also queued again.
+    """
+    now = time.time()
+    rows = [(leaf['Leaf Link'], json.dumps(leaf, default=str), now, pass_number or 0)
+            for leaf in leaf_data
+            if leaf.get('Leaf Link') and leaf.get('Leaf Link') != 'No Leaf Link']
+    with exclusive(conn):
+        before = conn.total_changes
+        if pass_number is None:
+            conn.executemany(
+                "INSERT OR IGNORE INTO leaves (leaf_link, payload, updated_at, pass_number) VALUES (?, ?, ?, ?)",
+                rows
+            )
+        else:
+            conn.executemany(
+                "INSERT INTO leaves (leaf_link, payload, updated_at, pass_number) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(leaf_link) DO UPDATE SET status = 'pending', attempts = 0, not_before = 0, "
+                "lease_owner = NULL, lease_expires = NULL, last_error = NULL, payload = excluded.payload, "
+                "pass_number = excluded.pass_number, updated_at = excluded.updated_at "
+                "WHERE leaves.pass_number < excluded.pass_number AND leaves.status != 'leased'",
+                rows
+            )
+        return conn.total_changes - before
+
+
+def import_error_log(conn, error_log_filename):
+    """Requeue every leaf listed in scraping_errors.csv, keeping the logged error message."""
+    now = time.time()
+    count = 0
+    with open(error_log_filename, 'r', newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    with exclusive(conn):
+        for row in rows:
+            row['Leaf name'] = row.pop('Leaf Name', row.get('Leaf name'))
+            error = row.pop('Error', '')
+            leaf = {col: row.get(col) for col in LEAF_COLUMNS}
+            if not leaf['Leaf Link']:
+                continue
+            conn.execute(
+                "INSERT INTO leaves (leaf_link, payload, last_error, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(leaf_link) DO UPDATE SET status = 'pending', attempts = 0, not_before = 0, "
+                "lease_owner = NULL, lease_expires = NULL, last_error = excluded.last_error, "
+                "updated_at = excluded.updated_at WHERE status != 'leased'",
+                (leaf['Leaf Link'], json.dumps(leaf), error, now)
+            )
+            count += 1
+    return count
+
+
+def lease_next(conn, worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Atomically claim the next pending leaf, or one whose lease expired because
+    its worker died. Returns the leaf record dict, or None when nothing is left.
+    """
+    now = time.time()
+    with exclusive(conn):
+        # Leases that expired on their final attempt go straight to the dead-letter state
+        conn.execute(
+            "UPDATE leaves SET status = 'dead', lease_owner = NULL, updated_at = ?, "
+            "last_error = COALESCE(last_error, 'Lease expired') "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, MAX_ATTEMPTS)
+        )
+        row = conn.execute(
+            "SELECT leaf_link, payload FROM leaves "
+            "WHERE (status = 'pending' AND not_before <= ?) OR (status = 'leased' AND lease_expires < ?) "
+            "ORDER BY attempts, updated_at LIMIT 1",
+            (now, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE leaves SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+            "lease_expires = ?, updated_at = ? WHERE leaf_link = ?",
+            (worker_id, now + lease_seconds, now, row['leaf_link'])
+        )
+    return json.loads(row['payload'])
+
+
+def heartbeat(conn, leaf_link, worker_id, lease_seconds=LEASE_SECONDS):
+    """Extend a lease we still own; False means it was lost to another worker."""
+    cursor = conn.execute(
+        "UPDATE leaves SET lease_expires = ? WHERE leaf_link = ? AND lease_owner = ? AND status = 'leased'",
+        (time.time() + lease_seconds, leaf_link, worker_id)
+    )
+    return cursor.rowcount == 1
+
+
+def complete(conn, leaf_link, worker_id):
+    conn.execute(
+        "UPDATE leaves SET status = 'done', lease_owner = NULL, lease_expires = NULL, "
+        "last_error = NULL, updated_at = ? WHERE leaf_link = ? AND lease_owner = ?",
+        (time.time(), leaf_link, worker_id)
+    )
+
+
+def complete_many(conn, leaf_links, worker_id):
+    """Acknowledge a whole flushed batch of leaves in one transaction."""
+    now = time.time()
+    with exclusive(conn):
+        conn.executemany(
+            "UPDATE leaves SET status = 'done', lease_owner = NULL, lease_expires = NULL, "
+            "last_error = NULL, updated_at = ? WHERE leaf_link = ? AND lease_owner = ?",
+            [(now, leaf_link, worker_id) for leaf_link in leaf_links]
+        )
+
+
+def fail(conn, leaf_link, worker_id, error_message, max_attempts=MAX_ATTEMPTS):
+    """
+    Release a failed lease: back to pending, not to be leased again before its backoff
+    delay has passed, or dead once attempts are exhausted.
+    """
+    row = conn.execute("SELECT attempts FROM leaves WHERE leaf_link = ?", (leaf_link,)).fetchone()
+    now = time.time()
+    not_before = now + backoff_delay((row['attempts'] if row else 1) - 1, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+    conn.execute(
+        "UPDATE leaves SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END, "
+        "lease_owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ?, not_before = ? "
+        "WHERE leaf_link = ? AND lease_owner = ?",
+        (max_attempts, error_message, now, not_before, leaf_link, worker_id)
+    )
+
+
+def start_pass(conn):
+    """
+    Begin a new incremental pass unless one is still in progress (pending or leased
+    rows); returns (pass number to enqueue with, whether it was just started).
+    """
+    with exclusive(conn):
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('pass', 0)")
+        current = conn.execute("SELECT value FROM counters WHERE name = 'pass'").fetchone()[0]
+        if conn.execute("SELECT 1 FROM leaves WHERE status IN ('pending', 'leased') LIMIT 1").fetchone():
+            return current, False
+        conn.execute("UPDATE counters SET value = ? WHERE name = 'pass'", (current + 1,))
+        return current + 1, True
+
+
+def listed_leaves(conn, pass_number):
+    """Links enqueued in this pass (or a later one)."""
+    rows = conn.execute("SELECT leaf_link FROM leaves WHERE pass_number >= ?", (pass_number,)).fetchall()
+    return {row['leaf_link'] for row in rows}
+
+
+def forget_unlisted(conn, pass_number):
+    """Delete the rows of leaves that were not listed again in this pass; returns how many."""
+    cursor = conn.execute("DELETE FROM leaves WHERE pass_number < ? AND status != 'leased'", (pass_number,))
+    return cursor.rowcount
+
+
+def reset_done(conn):
+    cursor = conn.execute(
+        "UPDATE leaves SET status = 'pending', attempts = 0, not_before = 0, last_error = NULL, updated_at = ? "
+        "WHERE status = 'done'",
+        (time.time(),)
+    )
+    return cursor.rowcount
+
+
+def requeue_dead(conn):
+    cursor = conn.execute(
+        "UPDATE leaves SET status = 'pending', attempts = 0, not_before = 0, updated_at = ? WHERE status = 'dead'",
+        (time.time(),)
+    )
+    return cursor.rowcount
+
+
+def waiting_retries(conn):
+    """Pending leaves that are still in their backoff delay."""
+    row = conn.execute("SELECT COUNT(*) AS n FROM leaves WHERE status = 'pending' AND not_before > ?",
+                       (time.time(),)).fetchone()
+    return row['n']
+
+
+def next_counter(conn, name, floor=0):
+    """Shared monotonically increasing counter (e.g. batch file numbers), never below floor + 1."""
+    with exclusive(conn):
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,))
+        conn.execute("UPDATE counters SET value = MAX(value, ?) + 1 WHERE name = ?", (floor, name))
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+
+def claim_role(conn, name, owner, lease_seconds=LEASE_SECONDS):
+    """Take the named role unless another live worker holds it; True if owner now has it."""
+    now = time.time()
+    with exclusive(conn):
+        row = conn.execute("SELECT owner, expires FROM roles WHERE name = ?", (name,)).fetchone()
+        if row is not None and row['owner'] != owner and row['expires'] >= now:
+            return False
+        conn.execute("INSERT OR REPLACE INTO roles (name, owner, expires) VALUES (?, ?, ?)",
+                     (name, owner, now + lease_seconds))
+        return True
+
+
+def renew_role(conn, name, owner, lease_seconds=LEASE_SECONDS):
+    cursor = conn.execute("UPDATE roles SET expires = ? WHERE name = ? AND owner = ?",
+                          (time.time() + lease_seconds, name, owner))
+    return cursor.rowcount == 1
+
+
+def release_role(conn, name, owner):
+    conn.execute("DELETE FROM roles WHERE name = ? AND owner = ?", (name, owner))
+
+
+def role_held(conn, name):
+    """True while some worker holds the role and its lease has not expired."""
+    row = conn.execute("SELECT 1 FROM roles WHERE name = ? AND expires >= ?", (name, time.time())).fetchone()
+    return row is not None
+
+
+def queue_stats(conn):
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM leaves GROUP BY status").fetchall()
+    return {row['status']: row['n'] for row in rows}
+
+
+def dead_letters(conn):
+    rows = conn.execute(
+        "SELECT leaf_link, attempts, last_error FROM leaves WHERE status = 'dead' ORDER BY leaf_link"
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+class LeaseHeartbeat:
+    """
+    Background thread that keeps a worker's leases alive from lease_next until the
+    leaf is acknowledged, which can be several leaves later when its batch is flushed.
+    Leases that could not be extended were taken over by another worker and end up in lost.
+    """
+
+    def __init__(self, db_path, worker_id, lease_seconds=LEASE_SECONDS):
+        self.db_path = db_path
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.held = set()
+        self.lost = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def hold(self, leaf_link):
+        with self._lock:
+            self.held.add(leaf_link)
+            self.lost.discard(leaf_link)
+
+    def release(self, leaf_link):
+        with self._lock:
+            self.held.discard(leaf_link)
+
+    def _run(self):
+        conn = connect(self.db_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                with self._lock:
+                    held = list(self.held)
+                for leaf_link in held:
+                    if not heartbeat(conn, leaf_link, self.worker_id, self.lease_seconds):
+                        print(f"Warning: lease lost for {leaf_link}")
+                        with self._lock:
+                            if leaf_link in self.held:
+                                self.held.discard(leaf_link)
+                                self.lost.add(leaf_link)
+        except Exception as e:
+            print(f"Heartbeat error for worker {self.worker_id}: {e}")
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class RoleHeartbeat:
+    """Keeps a claimed role alive in the background and releases it on exit."""
+
+    def __init__(self, db_path, name, owner, lease_seconds=LEASE_SECONDS):
+        self.db_path = db_path
+        self.name = name
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        conn = connect(self.db_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                if not renew_role(conn, self.name, self.owner, self.lease_seconds):
+                    print(f"Warning: role {self.name} lost by {self.owner}")
+                    return
+        except Exception as e:
+            print(f"Heartbeat error for role {self.name}: {e}")
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        conn = connect(self.db_path)
+        try:
+            release_role(conn, self.name, self.owner)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python work_queue.py enqueue|import-errors|requeue-dead|reset|stats [csv]")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    conn = connect()
+    if command == 'enqueue':
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else 'KB.csv'
+        with open(csv_path, 'r', newline='', encoding='utf-8') as file:
+            leaves = [{col: row.get(col) for col in LEAF_COLUMNS} for row in csv.DictReader(file)]
+        print(f"Enqueued {enqueue_leaves(conn, leaves)} new leaves from {csv_path}")
+    elif command == 'import-errors':
+        error_path = sys.argv[2] if len(sys.argv) > 2 else 'scraping_errors.csv'
+        print(f"Requeued {import_error_log(conn, error_path)} leaves from {error_path}")
+    elif command == 'requeue-dead':
+        print(f"Requeued {requeue_dead(conn)} dead leaves")
+    elif command == 'reset':
+        print(f"Reset {reset_done(conn)} done leaves to pending")
+    elif command == 'stats':
+        print(queue_stats(conn))
+        for row in dead_letters(conn):
+            print(f"DEAD {row['leaf_link']} after {row['attempts']} attempts: {row['last_error']}")
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)